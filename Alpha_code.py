@@ -1,27 +1,91 @@
-import cv2
-import face_recognition
-import speech_recognition as sr
-import psycopg2
-from psycopg2 import sql, extras
+import time
+_module_import_started = time.perf_counter()
+import importlib
+import importlib.util
+import io
+import errno
 import json
 import os
 import numpy as np
 import pickle
 from datetime import datetime
-import time
 import logging
 from pathlib import Path
 import configparser
-from gtts import gTTS
 import tempfile
 import subprocess
 import sys
 import uuid
 import base64
 import hashlib
+import struct
+import mmap
+import threading
+import queue
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Future, CancelledError, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict, deque
 from enum import Enum
 import sqlite3
 import re
+import argparse
+import wave
+
+# ==================== LAZY IMPORTS ====================
+
+# Seconds spent importing each heavy module, and the thread that paid for it
+IMPORT_TIMES = {}
+
+class LazyModule:
+    """Stand-in for a heavy module that imports it on first attribute access"""
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    started = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    IMPORT_TIMES[self._name] = (time.perf_counter() - started, threading.current_thread().name)
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+# Camera, face models, speech, PostgreSQL and TTS each cost hundreds of ms to
+# seconds on a Pi; only the subsystems a run actually touches pay for them
+cv2 = LazyModule('cv2')
+face_recognition = LazyModule('face_recognition')
+sr = LazyModule('speech_recognition')
+psycopg2 = LazyModule('psycopg2')
+gtts = LazyModule('gtts')
+# Optional: on-device speech recognition and voice activity detection
+vosk = LazyModule('vosk')
+webrtcvad = LazyModule('webrtcvad')
+
+def preload_modules(modules):
+    """Import modules on a background thread so they are warm by the time they're used"""
+    def load_all():
+        for module in modules:
+            try:
+                module.load()
+            except Exception as e:
+                logger.warning(f"Background import of {module._name} failed: {str(e)}")
+    thread = threading.Thread(target=load_all, name='preload', daemon=True)
+    thread.start()
+    return thread
+
+def log_import_report():
+    """Log heavy import costs, slowest first, in the spirit of -X importtime"""
+    logger.info(f"Import of {__name__}: {1000 * MODULE_IMPORT_SECONDS:.0f} ms")
+    for name, (seconds, thread) in sorted(IMPORT_TIMES.items(), key=lambda item: -item[1][0]):
+        logger.info(f"Import of {name}: {1000 * seconds:.0f} ms on {thread}")
 
 # ==================== CONFIGURATION ====================
 
@@ -371,6 +435,421 @@ TRANSLATIONS = {
     }
 }
 
+# ==================== FACE TEMPLATES ====================
+
+# Stored face template layout: 8-byte little-endian header (magic, version,
+# dimension) followed by the encoding as little-endian float32 values.
+FACE_TEMPLATE_MAGIC = b'AFT\x00'
+FACE_TEMPLATE_VERSION = 1
+FACE_TEMPLATE_HEADER = struct.Struct('<4sHH')
+FACE_TEMPLATE_DTYPE = np.dtype('<f4')
+
+def encode_face_template(face_encoding):
+    """Serialize a face encoding into the binary template format"""
+    values = np.asarray(face_encoding, dtype=FACE_TEMPLATE_DTYPE).ravel()
+    header = FACE_TEMPLATE_HEADER.pack(FACE_TEMPLATE_MAGIC, FACE_TEMPLATE_VERSION, values.size)
+    return header + values.tobytes()
+
+def decode_face_template(blob):
+    """Return a read-only float32 view over a stored face template"""
+    magic, version, dim = FACE_TEMPLATE_HEADER.unpack_from(blob, 0)
+    if magic != FACE_TEMPLATE_MAGIC:
+        raise ValueError("Not a face template")
+    if version != FACE_TEMPLATE_VERSION:
+        raise ValueError(f"Unsupported face template version: {version}")
+    expected = FACE_TEMPLATE_HEADER.size + dim * FACE_TEMPLATE_DTYPE.itemsize
+    if len(blob) != expected:
+        raise ValueError(f"Face template has {len(blob)} bytes, expected {expected}")
+    return np.frombuffer(blob, dtype=FACE_TEMPLATE_DTYPE, count=dim, offset=FACE_TEMPLATE_HEADER.size)
+
+# ==================== FACE INDEX ====================
+
+# Snapshot layout: 12-byte header (magic, version, JSON length), a JSON
+# description of the arrays, then each array's raw bytes at an aligned offset.
+SNAPSHOT_MAGIC = b'AFIX'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct('<4sHxxI')
+SNAPSHOT_ALIGN = 64
+
+def _align(size):
+    return -(-size // SNAPSHOT_ALIGN) * SNAPSHOT_ALIGN
+
+def save_array_snapshot(path, arrays, meta):
+    """Atomically write named NumPy arrays and metadata to a mappable file"""
+    path = Path(path)
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += _align(array.nbytes)
+    header = json.dumps({'meta': meta, 'arrays': layout}).encode('utf-8')
+    data_start = _align(SNAPSHOT_HEADER.size + len(header))
+    
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]['offset'])
+            f.write(array.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def load_array_snapshot(path):
+    """Memory-map a snapshot written by save_array_snapshot"""
+    with open(path, 'rb') as f:
+        magic, version, header_len = SNAPSHOT_HEADER.unpack(f.read(SNAPSHOT_HEADER.size))
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot format in {path}")
+        header = json.loads(f.read(header_len).decode('utf-8'))
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    
+    data_start = _align(SNAPSHOT_HEADER.size + header_len)
+    arrays = {}
+    for name, info in header['arrays'].items():
+        dtype = np.dtype(info['dtype'])
+        shape = tuple(info['shape'])
+        count = int(np.prod(shape))
+        arrays[name] = np.frombuffer(
+            mapped, dtype=dtype, count=count, offset=data_start + info['offset']
+        ).reshape(shape)
+    return header['meta'], arrays
+
+class FaceIndex:
+    """Inverted-file (IVF) index: k-means buckets with exact re-ranking"""
+    def __init__(self, centroids, list_offsets, user_ids, encodings, nprobe=8):
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.user_ids = user_ids
+        self.encodings = encodings
+        self.nprobe = nprobe
+        # Users whose indexed encoding has been superseded since the build
+        self.excluded = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.user_ids) - len(self.excluded)
+
+    def exclude(self, user_id):
+        """Hide a user's indexed encoding without rebuilding"""
+        if user_id not in self.excluded and (self.user_ids == user_id).any():
+            self.excluded = np.append(self.excluded, np.int64(user_id))
+
+    def live_entries(self):
+        """Return (user_ids, encodings) that are still current"""
+        if not len(self.excluded):
+            return self.user_ids, self.encodings
+        keep = ~np.isin(self.user_ids, self.excluded)
+        return self.user_ids[keep], self.encodings[keep]
+
+    @classmethod
+    def build(cls, user_ids, encodings, nprobe=8, iterations=10, seed=0):
+        """Cluster encodings into sqrt(N) buckets stored contiguously by bucket"""
+        encodings = np.asarray(encodings, dtype=np.float32)
+        nlist = max(1, int(np.sqrt(len(encodings))))
+        rng = np.random.default_rng(seed)
+        
+        # Train centroids on a bounded sample, then assign every encoding
+        sample_size = min(len(encodings), nlist * 64)
+        sample = encodings[rng.choice(len(encodings), sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = cls._nearest_centroid(sample, centroids)
+            for i in range(nlist):
+                members = sample[assignment == i]
+                if len(members):
+                    centroids[i] = members.mean(axis=0)
+        
+        assignment = cls._nearest_centroid(encodings, centroids)
+        order = np.argsort(assignment, kind='stable')
+        list_offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=nlist), out=list_offsets[1:])
+        
+        return cls(
+            centroids,
+            list_offsets,
+            np.asarray(user_ids, dtype=np.int64)[order],
+            encodings[order],
+            nprobe=nprobe
+        )
+
+    @staticmethod
+    def _nearest_centroid(vectors, centroids):
+        # ||v - c||^2 without the constant ||v||^2 term
+        scores = (centroids ** 2).sum(axis=1) - 2.0 * vectors @ centroids.T
+        return np.argmin(scores, axis=1)
+
+    @classmethod
+    def from_snapshot(cls, arrays, nprobe=8):
+        return cls(
+            arrays['centroids'],
+            arrays['list_offsets'],
+            arrays['user_ids'],
+            arrays['encodings'],
+            nprobe=nprobe
+        )
+
+    def to_arrays(self):
+        return {
+            'centroids': self.centroids,
+            'list_offsets': self.list_offsets,
+            'user_ids': self.user_ids,
+            'encodings': self.encodings
+        }
+
+    def search(self, probe, k=1):
+        """Return up to k (user_id, distance) pairs nearest to probe in the probed buckets"""
+        nlist = len(self.centroids)
+        centroid_distances = np.linalg.norm(self.centroids - probe, axis=1)
+        if self.nprobe < nlist:
+            buckets = np.argpartition(centroid_distances, self.nprobe - 1)[:self.nprobe]
+        else:
+            buckets = np.arange(nlist)
+        
+        user_ids = []
+        distances = []
+        for bucket in np.sort(buckets):
+            start, stop = self.list_offsets[bucket], self.list_offsets[bucket + 1]
+            if start == stop:
+                continue
+            user_ids.append(self.user_ids[start:stop])
+            distances.append(np.linalg.norm(self.encodings[start:stop] - probe, axis=1))
+        if not user_ids:
+            return []
+        
+        user_ids = np.concatenate(user_ids)
+        distances = np.concatenate(distances)
+        if len(self.excluded):
+            distances[np.isin(user_ids, self.excluded)] = np.inf
+        return nearest_entries(user_ids, distances, k)
+
+def nearest_entries(user_ids, distances, k):
+    """Return the k smallest finite distances as sorted (user_id, distance) pairs"""
+    if len(distances) > k:
+        candidates = np.argpartition(distances, k - 1)[:k]
+    else:
+        candidates = np.arange(len(distances))
+    candidates = candidates[np.argsort(distances[candidates])]
+    return [
+        (int(user_ids[i]), float(distances[i]))
+        for i in candidates if np.isfinite(distances[i])
+    ]
+
+# ==================== FACE GALLERY ====================
+
+class FaceGallery:
+    """Known face encodings: an IVF index for the bulk plus a brute-force pending set"""
+    def __init__(self, dim=128, snapshot_path=None, index_min_size=2000, nprobe=8):
+        self.dim = dim
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self.index_min_size = index_min_size
+        self.nprobe = nprobe
+        self.source = None
+        # Database change counter the contents are known to reflect, saved with the snapshot
+        self.version = 0
+        self.index = None
+        # Encodings not yet covered by the index
+        self.user_ids = np.empty(0, dtype=np.int64)
+        self.encodings = np.empty((0, dim), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.user_ids) + (len(self.index) if self.index else 0)
+
+    def load(self, rows):
+        """Replace gallery contents with (user_id, encoding) rows"""
+        user_ids = []
+        encodings = []
+        for user_id, encoding in rows:
+            encoding = np.asarray(encoding, dtype=np.float32)
+            if encoding.shape != (self.dim,):
+                logger.warning(f"Skipping malformed face encoding for user {user_id}")
+                continue
+            user_ids.append(user_id)
+            encodings.append(encoding)
+        
+        self.index = None
+        self.user_ids = np.array(user_ids, dtype=np.int64)
+        self.encodings = (
+            np.vstack(encodings) if encodings else np.empty((0, self.dim), dtype=np.float32)
+        )
+        logger.info(f"Face gallery loaded with {len(self)} encodings")
+        if len(self) >= self.index_min_size:
+            self.rebuild_index()
+
+    def load_snapshot(self, source):
+        """Map the persisted index; returns its metadata or None if unusable"""
+        if not self.snapshot_path or not self.snapshot_path.exists():
+            return None
+        try:
+            meta, arrays = load_array_snapshot(self.snapshot_path)
+            if meta.get('source') != source or meta.get('dim') != self.dim:
+                logger.info("Face index snapshot belongs to a different database, ignoring it")
+                return None
+            self.index = FaceIndex.from_snapshot(arrays, nprobe=self.nprobe)
+            self.user_ids = np.empty(0, dtype=np.int64)
+            self.encodings = np.empty((0, self.dim), dtype=np.float32)
+            logger.info(f"Mapped face index snapshot with {len(self.index)} encodings")
+            return meta
+        except Exception as e:
+            logger.warning(f"Could not load face index snapshot: {str(e)}")
+            return None
+
+    def rebuild_index(self):
+        """Fold pending encodings into a fresh index and persist it"""
+        if not len(self):
+            return
+        user_ids = self.user_ids
+        encodings = self.encodings
+        if self.index:
+            indexed_ids, indexed_encodings = self.index.live_entries()
+            user_ids = np.concatenate([indexed_ids, user_ids])
+            encodings = np.concatenate([indexed_encodings, encodings])
+        
+        start = time.perf_counter()
+        self.index = FaceIndex.build(user_ids, encodings, nprobe=self.nprobe)
+        self.user_ids = np.empty(0, dtype=np.int64)
+        self.encodings = np.empty((0, self.dim), dtype=np.float32)
+        logger.info(
+            f"Built face index over {len(self.index)} encodings in "
+            f"{len(self.index.centroids)} buckets ({time.perf_counter() - start:.2f}s)"
+        )
+        
+        if self.snapshot_path:
+            try:
+                meta = {
+                    'source': self.source,
+                    'dim': self.dim,
+                    'count': len(self.index),
+                    'max_user_id': int(self.index.user_ids.max()),
+                    'version': self.version
+                }
+                save_array_snapshot(self.snapshot_path, self.index.to_arrays(), meta)
+                self.load_snapshot(self.source)
+            except Exception as e:
+                logger.warning(f"Could not persist face index snapshot: {str(e)}")
+
+    def remove(self, user_id):
+        """Drop any encoding held for a user"""
+        keep = self.user_ids != user_id
+        if not keep.all():
+            self.user_ids = self.user_ids[keep]
+            self.encodings = self.encodings[keep]
+        if self.index:
+            self.index.exclude(user_id)
+
+    def add(self, user_id, encoding):
+        """Insert or replace a user's encoding in the pending set"""
+        self.remove(user_id)
+        encoding = np.asarray(encoding, dtype=np.float32).reshape(1, self.dim)
+        self.user_ids = np.append(self.user_ids, np.int64(user_id))
+        self.encodings = np.vstack([self.encodings, encoding])
+        
+        # Keep the brute-force tail small relative to the index
+        indexed = len(self.index) if self.index else 0
+        if len(self) >= self.index_min_size and len(self.user_ids) > max(64, indexed // 10):
+            self.rebuild_index()
+
+    def nearest(self, face_encoding, k=1):
+        """Return up to k (user_id, distance) pairs closest to face_encoding"""
+        return self.nearest_batch([face_encoding], k)[0]
+
+    def nearest_batch(self, face_encodings, k=1):
+        """Return the k nearest (user_id, distance) pairs for each of several encodings"""
+        probes = np.asarray(face_encodings, dtype=np.float32).reshape(-1, self.dim)
+        if not len(self):
+            return [[] for _ in probes]
+        
+        results = [self.index.search(probe, k) if self.index else [] for probe in probes]
+        if len(self.user_ids):
+            # All probe-to-pending distances in one matrix product
+            squared = (
+                (probes ** 2).sum(axis=1)[:, None]
+                + (self.encodings ** 2).sum(axis=1)[None, :]
+                - 2.0 * probes @ self.encodings.T
+            )
+            distances = np.sqrt(np.maximum(squared, 0.0))
+            results = [
+                sorted(found + nearest_entries(self.user_ids, row, k), key=lambda r: r[1])[:k]
+                for found, row in zip(results, distances)
+            ]
+        return results
+
+    def match(self, face_encoding, tolerance=0.6):
+        """Return (user_id, distance) of the closest encoding within tolerance, else None"""
+        results = self.nearest(face_encoding)
+        if results and results[0][1] <= tolerance:
+            return results[0]
+        return None
+
+# ==================== RECENT VISITOR CACHE ====================
+
+class RecentVisitorCache:
+    """Small LRU of recently recognized visitors checked before the full gallery"""
+    def __init__(self, max_size=32, ttl=14400, tolerance=0.5, dim=128):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.tolerance = tolerance
+        # user_id -> (user record, expiry time, slot), least recently used first
+        self.entries = OrderedDict()
+        self.encodings = np.zeros((max_size, dim), dtype=np.float32)
+        self.slot_users = np.full(max_size, -1, dtype=np.int64)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _evict(self, user_id):
+        _, _, slot = self.entries.pop(user_id)
+        self.slot_users[slot] = -1
+
+    def _purge_expired(self, now):
+        for user_id in [uid for uid, (_, expires, _) in self.entries.items() if expires <= now]:
+            self._evict(user_id)
+
+    def lookup(self, face_encoding):
+        """Return a cached user record for a close enough encoding, else None"""
+        now = time.monotonic()
+        self._purge_expired(now)
+        occupied = np.flatnonzero(self.slot_users >= 0)
+        if len(occupied):
+            probe = np.asarray(face_encoding, dtype=np.float32)
+            distances = np.linalg.norm(self.encodings[occupied] - probe, axis=1)
+            i = int(np.argmin(distances))
+            if distances[i] <= self.tolerance:
+                user_id = int(self.slot_users[occupied[i]])
+                self.entries.move_to_end(user_id)
+                self.hits += 1
+                return {**self.entries[user_id][0], 'distance': float(distances[i])}
+        
+        self.misses += 1
+        return None
+
+    def put(self, user, face_encoding):
+        """Remember a visitor's latest encoding and record"""
+        user_id = user['user_id']
+        if user_id in self.entries:
+            self._evict(user_id)
+        elif len(self.entries) >= self.max_size:
+            self._evict(next(iter(self.entries)))
+        
+        slot = int(np.flatnonzero(self.slot_users < 0)[0])
+        self.encodings[slot] = face_encoding
+        self.slot_users[slot] = user_id
+        record = {key: value for key, value in user.items() if key != 'distance'}
+        self.entries[user_id] = (record, time.monotonic() + self.ttl, slot)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
 # ==================== DATABASE MANAGER ====================
 
 class DatabaseManager:
@@ -379,29 +858,100 @@ class DatabaseManager:
         self.config = config
         self.online = True
         self.connection = None
+        self.listen_connection = None
+        # After a lost LISTEN connection, poll by high-water mark until this time, then resubscribe
+        self.listen_retry_at = None
+        self.listen_retry_seconds = config.getfloat('POSTGRES', 'listen_retry_seconds', fallback=60)
+        self.gallery_high_water = 0
+        # Newest face_templates id whose centroid change the gallery has picked up
+        self.template_high_water = 0
+        self.data_version = None
+        self.locally_registered = set()
+        # Recognition can run on the session's identification thread alongside the main thread
+        self.lock = threading.RLock()
+        self.tolerance = config.getfloat('RECOGNITION', 'tolerance', fallback=0.6)
+        self.shortlist_size = config.getint('RECOGNITION', 'shortlist_size', fallback=5)
+        self.learn_templates = config.getboolean('RECOGNITION', 'learn_templates', fallback=True)
+        self.max_templates = config.getint('RECOGNITION', 'max_templates', fallback=5)
+        self.learn_min_distance = config.getfloat('RECOGNITION', 'learn_min_distance', fallback=0.2)
+        self.learn_max_distance = config.getfloat('RECOGNITION', 'learn_max_distance', fallback=0.45)
+        self.visitor_cache = RecentVisitorCache(
+            max_size=config.getint('RECOGNITION', 'cache_size', fallback=32),
+            ttl=config.getfloat('RECOGNITION', 'cache_ttl', fallback=14400),
+            tolerance=config.getfloat('RECOGNITION', 'cache_tolerance', fallback=0.5)
+        )
         self.setup_databases()
+        self.gallery = FaceGallery(
+            snapshot_path=self._gallery_snapshot_path(),
+            index_min_size=config.getint('RECOGNITION', 'index_min_size', fallback=2000),
+            nprobe=config.getint('RECOGNITION', 'index_nprobe', fallback=8)
+        )
+        self.gallery.source = self._gallery_source()
+        self.migrate_face_templates()
+        self.load_gallery()
         
+    def _connect_postgres(self):
+        return psycopg2.connect(
+            host=self.config['POSTGRES']['host'],
+            database=self.config['POSTGRES']['database'],
+            user=self.config['POSTGRES']['user'],
+            password=self.config['POSTGRES']['password'],
+            connect_timeout=5
+        )
+
     def setup_databases(self):
         """Initialize both database connections"""
         try:
             # Try PostgreSQL first
-            self.connection = psycopg2.connect(
-                host=self.config['POSTGRES']['host'],
-                database=self.config['POSTGRES']['database'],
-                user=self.config['POSTGRES']['user'],
-                password=self.config['POSTGRES']['password'],
-                connect_timeout=5
-            )
+            self.connection = self._connect_postgres()
             logger.info("Connected to PostgreSQL database")
             self._ensure_schema()
+            self._listen_for_user_changes()
         except Exception as e:
             logger.warning(f"PostgreSQL connection failed: {str(e)}. Falling back to SQLite.")
             self.online = False
             offline_db_path = Path(self.config['PATHS']['offline_db'])
             offline_db_path.parent.mkdir(parents=True, exist_ok=True)
-            self.connection = sqlite3.connect(offline_db_path)
+            self.connection = sqlite3.connect(offline_db_path, check_same_thread=False)
             self._ensure_schema()
     
+    def _listen_for_user_changes(self):
+        """Subscribe to users table notifications on a dedicated autocommit connection"""
+        self.listen_retry_at = None
+        try:
+            # LISTEN succeeds even when we couldn't install the trigger, e.g. without owning users
+            cursor = self.connection.cursor()
+            cursor.execute("""
+                SELECT 1 FROM pg_trigger WHERE tgname = 'users_changed' AND tgrelid = 'users'::regclass
+            """)
+            if cursor.fetchone() is None:
+                self.connection.rollback()
+                logger.warning("users_changed trigger is missing, polling for user changes instead")
+                self.listen_connection = None
+                return
+            self.connection.rollback()
+            
+            self.listen_connection = self._connect_postgres()
+            self.listen_connection.autocommit = True
+            self.listen_connection.cursor().execute("LISTEN alpha_users_changed")
+            logger.info("Listening for user table changes")
+        except Exception as e:
+            logger.warning(f"User change notifications unavailable, polling instead: {str(e)}")
+            try:
+                self.connection.rollback()
+            except Exception:
+                pass
+            self._drop_listen_connection()
+            self.listen_retry_at = time.monotonic() + self.listen_retry_seconds
+
+    def _drop_listen_connection(self):
+        connection, self.listen_connection = self.listen_connection, None
+        if connection:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
     def _ensure_schema(self):
         """Create tables if they don't exist with appropriate schema for each DB"""
         commands = []
@@ -445,6 +995,40 @@ class DatabaseManager:
                     request_time TIMESTAMP NOT NULL,
                     assisted_by_robot BOOLEAN NOT NULL
                 )
+                """,
+                """
+                CREATE OR REPLACE FUNCTION notify_users_changed() RETURNS trigger AS $$
+                BEGIN
+                    PERFORM pg_notify('alpha_users_changed', TG_OP || ':' || NEW.user_id);
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql
+                """,
+                """
+                DO $$
+                BEGIN
+                    -- Never drop it: other kiosks rely on the trigger while this one starts
+                    IF NOT EXISTS (
+                        SELECT 1 FROM pg_trigger
+                        WHERE tgname = 'users_changed' AND tgrelid = 'users'::regclass
+                    ) THEN
+                        CREATE TRIGGER users_changed
+                        AFTER INSERT OR UPDATE OF face_encoding ON users
+                        FOR EACH ROW EXECUTE PROCEDURE notify_users_changed();
+                    END IF;
+                END
+                $$
+                """,
+                """
+                CREATE TABLE IF NOT EXISTS face_templates (
+                    template_id SERIAL PRIMARY KEY,
+                    user_id INTEGER NOT NULL REFERENCES users(user_id),
+                    encoding BYTEA NOT NULL,
+                    created_at TIMESTAMP NOT NULL
+                )
+                """,
+                """
+                CREATE INDEX IF NOT EXISTS face_templates_user_idx ON face_templates(user_id)
                 """
             ])
         else:
@@ -487,12 +1071,32 @@ class DatabaseManager:
                     request_time TEXT NOT NULL,
                     assisted_by_robot INTEGER NOT NULL
                 )
+                """,
+                """
+                CREATE TABLE IF NOT EXISTS face_templates (
+                    template_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL REFERENCES users(user_id),
+                    encoding BLOB NOT NULL,
+                    created_at TEXT NOT NULL
+                )
+                """,
+                """
+                CREATE INDEX IF NOT EXISTS face_templates_user_idx ON face_templates(user_id)
                 """
             ])
         
         try:
             cursor = self.connection.cursor()
             
+            # Execute schema creation commands
+            for command in commands:
+                try:
+                    cursor.execute(command)
+                except Exception as e:
+                    logger.warning(f"Table may already exist: {str(e)}")
+                    self.connection.rollback()
+                    continue
+            
             # Check if services table is empty
             cursor.execute("SELECT COUNT(*) FROM services")
             if cursor.fetchone()[0] == 0:
@@ -521,15 +1125,6 @@ class DatabaseManager:
                 
                 cursor.executemany(insert_sql, default_services)
             
-            # Execute schema creation commands
-            for command in commands:
-                try:
-                    cursor.execute(command)
-                except Exception as e:
-                    logger.warning(f"Table may already exist: {str(e)}")
-                    self.connection.rollback()
-                    continue
-            
             self.connection.commit()
         except Exception as e:
             self.connection.rollback()
@@ -538,393 +1133,2606 @@ class DatabaseManager:
 
     def register_user(self, user_data, face_encoding):
         """Register a new user with facial data"""
+        with self.lock:
+            try:
+                query = """
+                    INSERT INTO users 
+                    (first_name, last_name, id_number, phone, email, face_encoding, registration_date, language_preference)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    RETURNING user_id
+                """ if self.online else """
+                    INSERT INTO users 
+                    (first_name, last_name, id_number, phone, email, face_encoding, registration_date, language_preference)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """
+                
+                params = (
+                    user_data['first_name'],
+                    user_data['last_name'],
+                    user_data['id_number'],
+                    user_data.get('phone'),
+                    user_data.get('email'),
+                    encode_face_template(face_encoding) if face_encoding is not None else None,
+                    datetime.now().isoformat(),
+                    user_data.get('language_preference', 'en')
+                )
+                
+                cursor = self.connection.cursor()
+                cursor.execute(query, params)
+                
+                if self.online:
+                    user_id = cursor.fetchone()[0]
+                else:
+                    user_id = cursor.lastrowid
+                
+                if face_encoding is not None:
+                    self._insert_face_template(cursor, user_id, face_encoding)
+                    
+                self.connection.commit()
+                if face_encoding is not None:
+                    self.gallery.add(user_id, face_encoding)
+                    self.locally_registered.add(user_id)
+                    self.visitor_cache.put({
+                        'user_id': user_id,
+                        'first_name': user_data['first_name'],
+                        'last_name': user_data['last_name']
+                    }, face_encoding)
+                logger.info(f"Registered new user with ID: {user_id}")
+                return user_id
+                
+            except Exception as e:
+                self.connection.rollback()
+                logger.error(f"User registration failed: {str(e)}")
+                raise
+
+    def _insert_face_template(self, cursor, user_id, face_encoding):
+        query = """
+            INSERT INTO face_templates (user_id, encoding, created_at) VALUES (%s, %s, %s)
+        """ if self.online else """
+            INSERT INTO face_templates (user_id, encoding, created_at) VALUES (?, ?, ?)
+        """
+        cursor.execute(query, (user_id, encode_face_template(face_encoding), datetime.now().isoformat()))
+
+    def add_face_template(self, user_id, face_encoding, templates, store_existing=False):
+        """Store an extra template for a user and refresh their centroid"""
         try:
-            query = """
-                INSERT INTO users 
-                (first_name, last_name, id_number, phone, email, face_encoding, registration_date, language_preference)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                RETURNING user_id
-            """ if self.online else """
-                INSERT INTO users 
-                (first_name, last_name, id_number, phone, email, face_encoding, registration_date, language_preference)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """
-            
-            params = (
-                user_data['first_name'],
-                user_data['last_name'],
-                user_data['id_number'],
-                user_data.get('phone'),
-                user_data.get('email'),
-                pickle.dumps(face_encoding) if face_encoding else None,
-                datetime.now().isoformat(),
-                user_data.get('language_preference', 'en')
-            )
-            
+            centroid = np.vstack([templates, face_encoding]).mean(axis=0)
             cursor = self.connection.cursor()
-            cursor.execute(query, params)
-            
-            if self.online:
-                user_id = cursor.fetchone()[0]
-            else:
-                user_id = cursor.lastrowid
-                
+            if store_existing:
+                # templates came from users.face_encoding; keep it as the user's first template
+                for template in templates:
+                    self._insert_face_template(cursor, user_id, template)
+            self._insert_face_template(cursor, user_id, face_encoding)
+            cursor.execute(
+                "UPDATE users SET face_encoding = %s WHERE user_id = %s" if self.online
+                else "UPDATE users SET face_encoding = ? WHERE user_id = ?",
+                (encode_face_template(centroid), user_id)
+            )
             self.connection.commit()
-            logger.info(f"Registered new user with ID: {user_id}")
-            return user_id
+            self.gallery.add(user_id, centroid)
+            logger.info(f"Added face template {len(templates) + 1} for user {user_id}")
             
         except Exception as e:
             self.connection.rollback()
-            logger.error(f"User registration failed: {str(e)}")
-            raise
+            logger.warning(f"Could not add face template for user {user_id}: {str(e)}")
 
-    def recognize_user(self, face_encoding):
-        """Attempt to recognize a known user by face"""
+    def migrate_face_templates(self):
+        """Convert legacy pickled encodings and seed face_templates from users"""
         try:
             cursor = self.connection.cursor()
-            
             if self.online:
                 cursor.execute("""
-                    SELECT user_id, first_name, last_name, face_encoding 
-                    FROM users 
-                    WHERE face_encoding IS NOT NULL
-                """)
+                    SELECT user_id, face_encoding FROM users 
+                    WHERE face_encoding IS NOT NULL AND substring(face_encoding from 1 for 4) <> %s
+                """, (FACE_TEMPLATE_MAGIC,))
+                update_sql = "UPDATE users SET face_encoding = %s WHERE user_id = %s"
             else:
                 cursor.execute("""
-                    SELECT user_id, first_name, last_name, face_encoding 
-                    FROM users 
-                    WHERE face_encoding IS NOT NULL
-                """)
+                    SELECT user_id, face_encoding FROM users 
+                    WHERE face_encoding IS NOT NULL AND substr(face_encoding, 1, 4) <> ?
+                """, (FACE_TEMPLATE_MAGIC,))
+                update_sql = "UPDATE users SET face_encoding = ? WHERE user_id = ?"
             
-            for row in cursor.fetchall():
+            updates = []
+            for user_id, blob in cursor.fetchall():
                 try:
-                    stored_encoding = pickle.loads(row[3]) if row[3] else None
-                    if stored_encoding and face_recognition.compare_faces(
-                        [stored_encoding], face_encoding, tolerance=0.6
-                    )[0]:
-                        return {
-                            'user_id': row[0],
-                            'first_name': row[1],
-                            'last_name': row[2]
-                        }
+                    # Legacy rows were written by register_user with pickle.dumps
+                    updates.append((encode_face_template(pickle.loads(bytes(blob))), user_id))
                 except Exception as e:
-                    logger.warning(f"Face comparison failed for user {row[0]}: {str(e)}")
-                    continue
-                    
-            return None
+                    logger.warning(f"Could not migrate face encoding for user {user_id}: {str(e)}")
             
-        except Exception as e:
-            logger.error(f"User recognition failed: {str(e)}")
-            raise
-
-    def log_visit(self, user_id, recognized):
-        """Record user visit in database"""
-        try:
-            query = """
-                INSERT INTO visits (user_id, visit_time, recognized)
-                VALUES (%s, %s, %s)
-            """ if self.online else """
-                INSERT INTO visits (user_id, visit_time, recognized)
-                VALUES (?, ?, ?)
-            """
+            if updates:
+                cursor.executemany(update_sql, updates)
+                logger.info(f"Migrated {len(updates)} face encodings to binary templates")
             
-            cursor = self.connection.cursor()
-            cursor.execute(query, (
-                user_id,
-                datetime.now().isoformat(),
-                recognized
-            ))
+            # Users enrolled before face_templates existed get their encoding as first template
+            cursor.execute("""
+                INSERT INTO face_templates (user_id, encoding, created_at)
+                SELECT user_id, face_encoding, registration_date FROM users u
+                WHERE face_encoding IS NOT NULL
+                AND NOT EXISTS (SELECT 1 FROM face_templates t WHERE t.user_id = u.user_id)
+            """)
+            if cursor.rowcount > 0:
+                logger.info(f"Created initial face templates for {cursor.rowcount} users")
             self.connection.commit()
-            logger.info(f"Logged visit for user {user_id}")
-            
+                
         except Exception as e:
             self.connection.rollback()
-            logger.error(f"Visit logging failed: {str(e)}")
+            logger.error(f"Face template migration failed: {str(e)}")
             raise
 
-    def log_service_request(self, user_id, service_id, assisted_by_robot):
-        """Record service request to database"""
+    def _gallery_snapshot_path(self):
+        """Face index snapshot lives next to the offline database"""
+        offline_db_path = Path(self.config['PATHS']['offline_db'])
+        name = 'face_index_online.bin' if self.online else 'face_index_offline.bin'
+        return offline_db_path.parent / name
+
+    def _gallery_source(self):
+        """Identify the database a gallery snapshot was built from"""
+        if self.online:
+            return f"postgresql://{self.config['POSTGRES']['host']}/{self.config['POSTGRES']['database']}"
+        return f"sqlite://{Path(self.config['PATHS']['offline_db']).resolve()}"
+
+    def _fetch_face_rows(self, min_user_id=None, user_ids=None):
+        """Read (user_id, encoding) rows, optionally only above a user_id or for given ids"""
+        query = """
+            SELECT user_id, face_encoding 
+            FROM users 
+            WHERE face_encoding IS NOT NULL
+        """
+        params = ()
+        if min_user_id is not None:
+            query += " AND user_id > %s" if self.online else " AND user_id > ?"
+            params = (min_user_id,)
+        elif user_ids is not None:
+            if self.online:
+                query += " AND user_id = ANY(%s)"
+                params = (list(user_ids),)
+            else:
+                query += f" AND user_id IN ({', '.join('?' * len(user_ids))})"
+                params = tuple(user_ids)
+        
+        cursor = self.connection.cursor()
+        cursor.execute(query, params)
+        
+        rows = []
+        for user_id, blob in cursor.fetchall():
+            try:
+                rows.append((user_id, decode_face_template(blob)))
+            except Exception as e:
+                logger.warning(f"Could not load face encoding for user {user_id}: {str(e)}")
+        return rows
+
+    def _template_high_water(self):
+        """Newest face_templates id; every centroid change adds a template"""
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT MAX(template_id) FROM face_templates")
+        return cursor.fetchone()[0] or 0
+
+    def _users_with_new_templates(self, min_template_id, max_user_id):
+        """Users at or below max_user_id whose centroid changed after min_template_id"""
+        query = """
+            SELECT DISTINCT user_id FROM face_templates WHERE template_id > %s AND user_id <= %s
+        """ if self.online else """
+            SELECT DISTINCT user_id FROM face_templates WHERE template_id > ? AND user_id <= ?
+        """
+        cursor = self.connection.cursor()
+        cursor.execute(query, (min_template_id, max_user_id))
+        return [row[0] for row in cursor.fetchall()]
+
+    def load_gallery(self):
+        """Map the face index snapshot if it is current, else scan all stored encodings"""
         try:
-            query = """
-                INSERT INTO service_requests 
-                (user_id, service_id, request_time, assisted_by_robot)
-                VALUES (%s, %s, %s, %s)
-            """ if self.online else """
-                INSERT INTO service_requests 
-                (user_id, service_id, request_time, assisted_by_robot)
-                VALUES (?, ?, ?, ?)
-            """
+            # Read before the encodings so the stored version never claims more than they reflect
+            version = self._template_high_water()
+            meta = self.gallery.load_snapshot(self.gallery.source)
+            if meta:
+                # The snapshot is valid if nothing at or below its high-water mark changed
+                query = """
+                    SELECT COUNT(*) FROM users WHERE face_encoding IS NOT NULL AND user_id <= %s
+                """ if self.online else """
+                    SELECT COUNT(*) FROM users WHERE face_encoding IS NOT NULL AND user_id <= ?
+                """
+                cursor = self.connection.cursor()
+                cursor.execute(query, (meta['max_user_id'],))
+                if cursor.fetchone()[0] == meta['count']:
+                    self.gallery_high_water = meta['max_user_id']
+                    # Indexed users whose centroid was refreshed after the snapshot was written
+                    changed = self._users_with_new_templates(meta.get('version', 0), meta['max_user_id'])
+                    if changed:
+                        self._apply_gallery_rows(self._fetch_face_rows(user_ids=changed))
+                        logger.info(f"Refreshed {len(changed)} face centroids changed since the snapshot")
+                    self._apply_gallery_rows(self._fetch_face_rows(min_user_id=meta['max_user_id']))
+                    self.gallery.version = version
+                    self.template_high_water = version
+                    logger.info(f"Face gallery ready with {len(self.gallery)} encodings")
+                    return
+                logger.info("Face index snapshot is stale, rebuilding from database")
             
-            cursor = self.connection.cursor()
-            cursor.execute(query, (
-                user_id,
-                service_id,
-                datetime.now().isoformat(),
-                assisted_by_robot
-            ))
-            self.connection.commit()
-            logger.info(f"Logged service request for user {user_id}")
+            rows = self._fetch_face_rows()
+            self.gallery.version = version
+            self.template_high_water = version
+            self.gallery.load(rows)
+            self.gallery_high_water = max((user_id for user_id, _ in rows), default=0)
             
         except Exception as e:
-            self.connection.rollback()
-            logger.error(f"Service request logging failed: {str(e)}")
+            logger.error(f"Face gallery loading failed: {str(e)}")
             raise
 
-# ==================== VOICE ENGINE ====================
+    def _apply_gallery_rows(self, rows):
+        """Upsert fetched rows into the gallery and advance the high-water mark"""
+        for user_id, encoding in rows:
+            self.gallery.add(user_id, encoding)
+            self.gallery_high_water = max(self.gallery_high_water, user_id)
 
-class VoiceEngine:
-    """Handles all voice interactions with offline fallback"""
-    def __init__(self, config):
-        self.config = config
-        self.current_language = 'en'
-        self.offline = False
-        self.recognizer = sr.Recognizer()
-        self.microphone = self.select_microphone()
-        self.test_audio_system()
-        
-    def select_microphone(self):
-        """Select USB camera microphone if available"""
-        mics = sr.Microphone.list_microphone_names()
-        logger.info(f"Available microphones: {mics}")
-        
-        # Find USB camera microphone
-        usb_mic_index = None
-        for i, name in enumerate(mics):
-            if 'usb' in name.lower() or 'camera' in name.lower():
-                usb_mic_index = i
-                logger.info(f"Using USB microphone: {name} at index {i}")
-                break
-            elif 'mic' in name.lower() or 'input' in name.lower():
-                usb_mic_index = i  # Fallback to any mic
-                
-        if usb_mic_index is None:
-            logger.warning("No specific USB microphone found, using default")
-            return sr.Microphone()
-        return sr.Microphone(device_index=usb_mic_index)
-    
-    def test_audio_system(self):
-        """Check if required audio components are available"""
+    def sync_gallery(self):
+        """Pull only users added or changed by other clients since the last sync"""
         try:
-            # Test internet-dependent components
-            test_tts = gTTS(text="test", lang='en')
-            with tempfile.NamedTemporaryFile() as f:
-                test_tts.save(f.name)
+            if self.online and self.listen_retry_at is not None and time.monotonic() >= self.listen_retry_at:
+                self._listen_for_user_changes()
+            if self.online and self.listen_connection:
+                try:
+                    self.listen_connection.poll()
+                except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                    logger.warning(f"Lost user change notifications, polling until reconnected: {str(e)}")
+                    self._drop_listen_connection()
+                    self.listen_retry_at = time.monotonic() + self.listen_retry_seconds
+            if self.online and self.listen_connection:
+                changed = set()
+                for notify in self.listen_connection.notifies:
+                    operation, _, user_id = notify.payload.partition(':')
+                    user_id = int(user_id)
+                    # Our own inserts are already in the gallery
+                    if operation == 'INSERT' and user_id in self.locally_registered:
+                        continue
+                    changed.add(user_id)
+                self.listen_connection.notifies.clear()
+                
+                if changed:
+                    self._apply_gallery_rows(self._fetch_face_rows(user_ids=changed))
+                    logger.info(f"Face gallery synced {len(changed)} changed users")
+                return
             
-            # Test system audio
-            subprocess.run(['which', 'mpg123'], check=True, 
-                         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            cursor = self.connection.cursor()
+            if not self.online:
+                # data_version only changes when another connection commits
+                cursor.execute("PRAGMA data_version")
+                data_version = cursor.fetchone()[0]
+                if data_version == self.data_version:
+                    return
+                self.data_version = data_version
             
-            # Calibrate microphone
-            with self.microphone as source:
-                self.recognizer.adjust_for_ambient_noise(source, duration=2)
+            # Read first so a template added while we fetch is picked up next time
+            template_high_water = self._template_high_water()
+            cursor.execute("SELECT MAX(user_id) FROM users WHERE face_encoding IS NOT NULL")
+            max_user_id = cursor.fetchone()[0] or 0
+            if max_user_id > self.gallery_high_water:
+                rows = [
+                    row for row in self._fetch_face_rows(min_user_id=self.gallery_high_water)
+                    if row[0] not in self.locally_registered
+                ]
+                self._apply_gallery_rows(rows)
+                self.gallery_high_water = max_user_id
+                if rows:
+                    logger.info(f"Face gallery synced {len(rows)} new users")
             
-            logger.info("Audio system fully operational")
+            # Existing users whose centroid another client refreshed with a learned template
+            if template_high_water > self.template_high_water:
+                changed = self._users_with_new_templates(self.template_high_water, self.gallery_high_water)
+                if changed:
+                    self._apply_gallery_rows(self._fetch_face_rows(user_ids=changed))
+                    logger.info(f"Face gallery synced {len(changed)} changed centroids")
+                self.template_high_water = template_high_water
+                    
         except Exception as e:
-            logger.warning(f"Audio system limited: {str(e)}")
-            self.offline = True
-    
-    def set_language(self, language_code):
-        """Set the current language for voice interactions"""
-        if language_code in TRANSLATIONS:
-            self.current_language = language_code
-            logger.info(f"Language set to: {language_code}")
-        else:
-            logger.warning(f"Unsupported language code: {language_code}")
+            if self.online:
+                self.connection.rollback()
+            logger.warning(f"Face gallery sync failed: {str(e)}")
 
-    def speak(self, text, slow=False):
-        """Text-to-speech with offline fallback"""
-        try:
-            if not self.offline:
-                tts = gTTS(
-                    text=text,
-                    lang=TRANSLATIONS[self.current_language]['lang_code'],
-                    slow=slow
-                )
-                with tempfile.NamedTemporaryFile(suffix=".mp3", delete=True) as f:
-                    tts.save(f.name)
-                    subprocess.run(
-                        ['mpg123', '-q', f.name],
-                        check=True,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE
-                    )
-            else:
-                # Fallback to espeak if available
-                try:
-                    subprocess.run(
-                        ['espeak', '-v', self.current_language, text],
-                        check=True
-                    )
-                except:
-                    # Final fallback - just print
-                    print(f"SPEAK: {text}")
-        except Exception as e:
-            logger.error(f"Speech synthesis failed: {str(e)}")
-            raise
+    def recognize_user(self, face_encoding):
+        """Attempt to recognize a known user by face"""
+        return self.recognize_users([face_encoding])[0]
 
-    def listen(self, timeout=5, phrase_time_limit=10):
-        """Speech recognition with offline fallback"""
-        try:
-            with self.microphone as source:
-                logger.debug("Listening...")
-                audio = self.recognizer.listen(
-                    source,
-                    timeout=timeout,
-                    phrase_time_limit=phrase_time_limit
-                )
+    def recognize_users(self, face_encodings):
+        """Recognize several faces at once; returns a user record or None per face"""
+        with self.lock:
+            try:
+                results = [self.visitor_cache.lookup(face_encoding) for face_encoding in face_encodings]
+                if any(results):
+                    logger.info(f"Recent visitor cache hit: {self.visitor_cache.stats()}")
+                pending = [i for i, user in enumerate(results) if user is None]
+                if not pending:
+                    return results
                 
-                if not self.offline:
+                self.sync_gallery()
+                probes = np.asarray([face_encodings[i] for i in pending], dtype=np.float32)
+                
+                # Shortlist users by centroid, then compare only their templates
+                shortlist = sorted({
+                    user_id
+                    for nearest in self.gallery.nearest_batch(probes, k=self.shortlist_size)
+                    for user_id, _ in nearest
+                })
+                if not shortlist:
+                    return results
+                
+                cursor = self.connection.cursor()
+                if self.online:
+                    cursor.execute("""
+                        SELECT u.user_id, u.first_name, u.last_name,
+                               COALESCE(t.encoding, u.face_encoding), t.template_id IS NULL
+                        FROM users u LEFT JOIN face_templates t ON t.user_id = u.user_id
+                        WHERE u.user_id = ANY(%s) AND COALESCE(t.encoding, u.face_encoding) IS NOT NULL
+                        ORDER BY u.user_id
+                    """, (shortlist,))
+                else:
+                    cursor.execute(f"""
+                        SELECT u.user_id, u.first_name, u.last_name,
+                               COALESCE(t.encoding, u.face_encoding), t.template_id IS NULL
+                        FROM users u LEFT JOIN face_templates t ON t.user_id = u.user_id
+                        WHERE u.user_id IN ({', '.join('?' * len(shortlist))})
+                        AND COALESCE(t.encoding, u.face_encoding) IS NOT NULL
+                        ORDER BY u.user_id
+                    """, shortlist)
+                
+                records = {}
+                owners = []
+                templates = []
+                # Users written by other clients may not have face_templates rows yet
+                untemplated = set()
+                for user_id, first_name, last_name, blob, missing in cursor.fetchall():
+                    try:
+                        templates.append(decode_face_template(blob))
+                        owners.append(user_id)
+                        records[user_id] = (first_name, last_name)
+                        if missing:
+                            untemplated.add(user_id)
+                    except Exception as e:
+                        logger.warning(f"Could not load face template for user {user_id}: {str(e)}")
+                if not templates:
+                    return results
+                
+                # Per-user minimum template distance for every probe (rows are grouped by user)
+                templates = np.vstack(templates)
+                owners = np.asarray(owners)
+                user_ids, starts = np.unique(owners, return_index=True)
+                distances = np.linalg.norm(probes[:, None, :] - templates[None, :, :], axis=2)
+                user_distances = np.minimum.reduceat(distances, starts, axis=1)
+                
+                # Each face and each user can be matched at most once, closest pairs first
+                while True:
+                    probe_index, user_index = np.unravel_index(np.argmin(user_distances), user_distances.shape)
+                    distance = float(user_distances[probe_index, user_index])
+                    if not distance <= self.tolerance:
+                        break
+                    user_distances[probe_index, :] = np.inf
+                    user_distances[:, user_index] = np.inf
+                    
+                    user_id = int(user_ids[user_index])
+                    face_encoding = probes[probe_index]
+                    user = {
+                        'user_id': user_id,
+                        'first_name': records[user_id][0],
+                        'last_name': records[user_id][1],
+                        'distance': distance
+                    }
+                    results[pending[probe_index]] = user
+                    self.visitor_cache.put(user, face_encoding)
+                    
+                    user_templates = templates[owners == user_id]
+                    if (self.learn_templates and len(user_templates) < self.max_templates
+                            and self.learn_min_distance <= distance <= self.learn_max_distance):
+                        self.add_face_template(
+                            user_id, face_encoding, user_templates, store_existing=user_id in untemplated
+                        )
+                return results
+                
+            except Exception as e:
+                logger.error(f"User recognition failed: {str(e)}")
+                raise
+
+    def find_user_by_id_number(self, id_number):
+        """Look up a registered user by ID number; None if there is none"""
+        with self.lock:
+            try:
+                query = """
+                    SELECT user_id, first_name, last_name FROM users WHERE id_number = %s
+                """ if self.online else """
+                    SELECT user_id, first_name, last_name FROM users WHERE id_number = ?
+                """
+                cursor = self.connection.cursor()
+                cursor.execute(query, (id_number,))
+                row = cursor.fetchone()
+                if row is None:
+                    return None
+                return {'user_id': row[0], 'first_name': row[1], 'last_name': row[2]}
+                
+            except Exception as e:
+                if self.online:
+                    self.connection.rollback()
+                logger.error(f"User lookup failed: {str(e)}")
+                raise
+
+    def log_visit(self, user_id, recognized):
+        """Record user visit in database"""
+        with self.lock:
+            try:
+                query = """
+                    INSERT INTO visits (user_id, visit_time, recognized)
+                    VALUES (%s, %s, %s)
+                """ if self.online else """
+                    INSERT INTO visits (user_id, visit_time, recognized)
+                    VALUES (?, ?, ?)
+                """
+                
+                cursor = self.connection.cursor()
+                cursor.execute(query, (
+                    user_id,
+                    datetime.now().isoformat(),
+                    recognized
+                ))
+                self.connection.commit()
+                logger.info(f"Logged visit for user {user_id}")
+                
+            except Exception as e:
+                self.connection.rollback()
+                logger.error(f"Visit logging failed: {str(e)}")
+                raise
+
+    def log_visits(self, visits):
+        """Record several (user_id, recognized) visits with one batched insert"""
+        with self.lock:
+            if not visits:
+                return
+            try:
+                visit_time = datetime.now().isoformat()
+                rows = [(user_id, visit_time, recognized) for user_id, recognized in visits]
+                cursor = self.connection.cursor()
+                if self.online:
+                    # executemany is a round trip per row in psycopg2; send one multi-row VALUES
+                    cursor.execute(
+                        "INSERT INTO visits (user_id, visit_time, recognized) VALUES "
+                        + ", ".join(["(%s, %s, %s)"] * len(rows)),
+                        [value for row in rows for value in row]
+                    )
+                else:
+                    cursor.executemany("""
+                        INSERT INTO visits (user_id, visit_time, recognized)
+                        VALUES (?, ?, ?)
+                    """, rows)
+                self.connection.commit()
+                logger.info(f"Logged visits for users {[user_id for user_id, _ in visits]}")
+                
+            except Exception as e:
+                self.connection.rollback()
+                logger.error(f"Visit logging failed: {str(e)}")
+                raise
+
+    def log_service_request(self, user_id, service_id, assisted_by_robot):
+        """Record service request to database"""
+        with self.lock:
+            try:
+                query = """
+                    INSERT INTO service_requests 
+                    (user_id, service_id, request_time, assisted_by_robot)
+                    VALUES (%s, %s, %s, %s)
+                """ if self.online else """
+                    INSERT INTO service_requests 
+                    (user_id, service_id, request_time, assisted_by_robot)
+                    VALUES (?, ?, ?, ?)
+                """
+                
+                cursor = self.connection.cursor()
+                cursor.execute(query, (
+                    user_id,
+                    service_id,
+                    datetime.now().isoformat(),
+                    assisted_by_robot
+                ))
+                self.connection.commit()
+                logger.info(f"Logged service request for user {user_id}")
+                
+            except Exception as e:
+                self.connection.rollback()
+                logger.error(f"Service request logging failed: {str(e)}")
+                raise
+
+# ==================== TTS CACHE ====================
+
+def tts_cache_key(text, lang_code, slow=False, engine='gtts'):
+    """Content address of one synthesized utterance"""
+    payload = json.dumps([text, lang_code, bool(slow), engine], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def render_speech(text, lang_code, slow=False):
+    """Synthesize text to MP3 bytes with gTTS"""
+    buffer = io.BytesIO()
+    gtts.gTTS(text=text, lang=lang_code, slow=slow).write_to_fp(buffer)
+    return buffer.getvalue()
+
+def write_file_atomic(path, data):
+    """Write bytes through a unique temp file so readers never see a partial file"""
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+class TTSCache:
+    """On-disk LRU of synthesized speech files named by their tts_cache_key"""
+    def __init__(self, directory, max_bytes=200 * 1024 * 1024, suffix='.mp3'):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        # key -> file size, least recently used first
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bundle_hits = 0
+        # key -> path of a read-only prerendered file, checked before the LRU
+        self.bundle = {}
+        self.lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._scan()
+
+    def _path(self, key):
+        return self.directory / (key + self.suffix)
+
+    def _scan(self):
+        """Rebuild the LRU order from file modification times, dropping interrupted writes"""
+        files = []
+        for path in self.directory.iterdir():
+            if path.name.endswith('.tmp'):
+                path.unlink(missing_ok=True)
+            elif path.suffix == self.suffix:
+                stat = path.stat()
+                files.append((stat.st_mtime, path.stem, stat.st_size))
+        for _, key, size in sorted(files):
+            self.entries[key] = size
+            self.total_bytes += size
+        self._evict()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            key, size = self.entries.popitem(last=False)
+            self._path(key).unlink(missing_ok=True)
+            self.total_bytes -= size
+            self.evictions += 1
+
+    def load_bundle(self, directory):
+        """Serve the prompts of a prerendered audio bundle; returns its index or None"""
+        index = load_audio_bundle_index(directory)
+        if index is None:
+            return None
+        if index.get('format') != AUDIO_BUNDLE_FORMAT:
+            logger.warning(f"Ignoring audio bundle in {directory} with format {index.get('format')}")
+            return None
+        self.bundle = {
+            entry['key']: Path(directory) / (entry['key'] + self.suffix)
+            for entry in index['entries'].values()
+        }
+        return index
+
+    def get(self, key):
+        """Return cached audio bytes, or None on a miss"""
+        with self.lock:
+            if key in self.bundle:
+                try:
+                    data = self.bundle[key].read_bytes()
+                    self.hits += 1
+                    self.bundle_hits += 1
+                    return data
+                except OSError:
+                    del self.bundle[key]
+            if key in self.entries:
+                path = self._path(key)
+                try:
+                    data = path.read_bytes()
+                    # Persist recency so the LRU order survives restarts
+                    os.utime(path)
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return data
+                except OSError:
+                    self.total_bytes -= self.entries.pop(key)
+            self.misses += 1
+            return None
+
+    def put(self, key, data):
+        """Store audio atomically so readers never see a partial file"""
+        write_file_atomic(self._path(key), data)
+        with self.lock:
+            self.total_bytes += len(data) - self.entries.pop(key, 0)
+            self.entries[key] = len(data)
+            self._evict()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'bytes': self.total_bytes,
+            'hits': self.hits,
+            'bundle_hits': self.bundle_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
+def split_speech(text, max_chars=200):
+    """Split text into sentences, breaking overlong ones at clause boundaries"""
+    chunks = []
+    # Sentence ends, but not list numbers like "2. Entrepreneurship"
+    for sentence in re.split(r'(?<=[^\d\s][.!?])\s+', text.strip()):
+        while len(sentence) > max_chars:
+            cut = max(sentence.rfind(mark, 0, max_chars) for mark in (', ', '; ', ': '))
+            if cut <= 0:
+                break
+            chunks.append(sentence[:cut + 1])
+            sentence = sentence[cut + 2:]
+        if sentence:
+            chunks.append(sentence)
+    return chunks
+
+# ==================== AUDIO BUNDLE ====================
+
+AUDIO_BUNDLE_FORMAT = 1
+
+def iter_translation_prompts(translations=TRANSLATIONS):
+    """Yield (language, prompt name, text) for every spoken string, including service_details"""
+    for language, strings in translations.items():
+        for name, value in strings.items():
+            if name == 'lang_code':
+                continue
+            if isinstance(value, dict):
+                for detail, text in value.items():
+                    yield language, f"{name}.{detail}", text
+            else:
+                yield language, name, value
+
+def load_audio_bundle_index(bundle_dir):
+    try:
+        with open(Path(bundle_dir) / 'index.json', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+# ==================== LOCAL SPEECH RECOGNITION ====================
+
+DIGIT_WORDS = {
+    'zero': '0', 'oh': '0', 'one': '1', 'two': '2', 'three': '3', 'four': '4',
+    'five': '5', 'six': '6', 'seven': '7', 'eight': '8', 'nine': '9'
+}
+
+# Phrase sets the local recognizer decodes against, by the name listen(expect=...) uses
+SPEECH_GRAMMARS = {
+    'languages': ['english', 'siswati', 'zulu', 'tsonga'],
+    'yes_no': ['yes', 'no'],
+    'digits': list(DIGIT_WORDS)
+}
+
+def digits_from_words(text):
+    """Turn spoken digits ("eight zero one", "801 55") into a digit string, else return text"""
+    tokens = [DIGIT_WORDS.get(token, token) for token in text.lower().split()]
+    joined = ''.join(tokens)
+    return joined if tokens and joined.isdigit() else text
+
+def resolve_grammar(expect):
+    return SPEECH_GRAMMARS.get(expect, expect) if isinstance(expect, str) else expect
+
+class LocalRecognizer:
+    """Vosk recognizer that decodes against a grammar of the answers a turn expects"""
+    def __init__(self, model_path, sample_rate=16000):
+        vosk.SetLogLevel(-1)
+        self.model = vosk.Model(str(model_path))
+        self.sample_rate = sample_rate
+
+    def recognize(self, pcm, phrases=None, sample_rate=None):
+        """Decode 16-bit mono PCM; returns (text or None, mean word confidence)"""
+        sample_rate = sample_rate or self.sample_rate
+        if phrases:
+            grammar = json.dumps(sorted({phrase.lower() for phrase in phrases}) + ['[unk]'])
+            recognizer = vosk.KaldiRecognizer(self.model, sample_rate, grammar)
+        else:
+            recognizer = vosk.KaldiRecognizer(self.model, sample_rate)
+        recognizer.SetWords(True)
+        for start in range(0, len(pcm), 8000):
+            recognizer.AcceptWaveform(pcm[start:start + 8000])
+        result = json.loads(recognizer.FinalResult())
+        
+        words = [word for word in result.get('result', []) if word.get('word') != '[unk]']
+        text = ' '.join(word['word'] for word in words)
+        confidence = float(np.mean([word.get('conf', 0.0) for word in words])) if words else 0.0
+        return (text or None), confidence
+
+def load_local_recognizer(model_path):
+    """LocalRecognizer for model_path, or None when Vosk or the model is missing"""
+    if importlib.util.find_spec('vosk') is None:
+        logger.info("Vosk not installed, local speech recognition disabled")
+        return None
+    if not Path(model_path).is_dir():
+        logger.warning(f"Vosk model not found at {model_path}, local speech recognition disabled")
+        return None
+    try:
+        return LocalRecognizer(model_path)
+    except Exception as e:
+        logger.warning(f"Could not load Vosk model from {model_path}: {str(e)}")
+        return None
+
+# ==================== VOICE ACTIVITY DETECTION ====================
+
+class VoiceActivityDetector:
+    """Per-frame speech detector: WebRTC VAD when installed, else energy plus spectral shape"""
+    def __init__(self, sample_rate=16000, aggressiveness=2, min_rms=0, energy_ratio=3.0):
+        self.sample_rate = sample_rate
+        # Frames quieter than this are never speech, e.g. to ignore our own prompt's echo
+        self.min_energy = float(min_rms) ** 2
+        self.energy_ratio = energy_ratio
+        self.noise_floor = None
+        self.window = None
+        self.webrtc = None
+        if importlib.util.find_spec('webrtcvad') is not None:
+            self.webrtc = webrtcvad.Vad(aggressiveness)
+
+    def is_speech(self, frame):
+        """Classify one 10, 20 or 30 ms frame of 16-bit mono PCM"""
+        samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+        energy = float(np.dot(samples, samples)) / max(1, len(samples))
+        if energy < self.min_energy:
+            return False
+        if self.webrtc is not None:
+            return self.webrtc.is_speech(bytes(frame), self.sample_rate)
+        
+        if self.noise_floor is None:
+            self.noise_floor = energy
+        if self.window is None or len(self.window) != len(samples):
+            self.window = np.hanning(len(samples)).astype(np.float32)
+            self.band = None
+        spectrum = np.abs(np.fft.rfft(samples * self.window)) ** 2 + 1e-10
+        if self.band is None:
+            freqs = np.fft.rfftfreq(len(samples), 1.0 / self.sample_rate)
+            self.band = (freqs >= 80) & (freqs <= 4000)
+        # Voiced speech is loud against the noise floor, tonal (low flatness) and
+        # concentrated between its fundamental and the upper formants
+        flatness = float(np.exp(np.mean(np.log(spectrum))) / np.mean(spectrum))
+        band_ratio = float(spectrum[self.band].sum() / spectrum.sum())
+        speech = energy > self.energy_ratio * self.noise_floor and flatness < 0.3 and band_ratio > 0.6
+        if not speech:
+            self.noise_floor = 0.95 * self.noise_floor + 0.05 * energy
+        return speech
+
+# ==================== MICROPHONE STREAM ====================
+
+class MicrophoneStream:
+    """Keeps the microphone open, copying every chunk into a preallocated ring of frames"""
+    def __init__(self, microphone, seconds=10.0):
+        self.microphone = microphone
+        self.source = None
+        self.sample_rate = microphone.SAMPLE_RATE
+        self.sample_width = microphone.SAMPLE_WIDTH
+        self.chunk = microphone.CHUNK
+        self.frame_seconds = self.chunk / self.sample_rate
+        self.frame_bytes = self.chunk * self.sample_width
+        self.capacity = max(1, int(seconds / self.frame_seconds))
+        self.buffer = bytearray(self.capacity * self.frame_bytes)
+        view = memoryview(self.buffer)
+        # One view per slot, made once; PyAudio still returns a new bytes per read, which is copied in and dropped
+        self.slots = [view[i * self.frame_bytes:(i + 1) * self.frame_bytes] for i in range(self.capacity)]
+        # Total frames written; frame n lives in slot n % capacity
+        self.written = 0
+        self.new_frame = threading.Condition()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.source = self.microphone.__enter__()
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='microphone', daemon=True)
+        self.thread.start()
+        return self
+
+    def _reopen(self, attempts=3):
+        """Close and reopen the device after a read error; False if it stays unusable"""
+        for attempt in range(attempts):
+            try:
+                self.microphone.__exit__(None, None, None)
+            except Exception:
+                pass
+            try:
+                self.source = self.microphone.__enter__()
+                logger.info("Microphone reopened")
+                return True
+            except Exception as e:
+                logger.warning(f"Microphone reopen attempt {attempt + 1} failed: {str(e)}")
+                time.sleep(0.5)
+        return False
+
+    def _run(self):
+        while self.running:
+            try:
+                data = self.source.stream.read(self.chunk)
+            except Exception as e:
+                logger.error(f"Microphone read failed: {str(e)}")
+                if self.running and self._reopen():
+                    continue
+                break
+            self.slots[self.written % self.capacity][:len(data)] = data
+            with self.new_frame:
+                self.written += 1
+                self.new_frame.notify_all()
+        with self.new_frame:
+            self.running = False
+            self.new_frame.notify_all()
+
+    def wait(self, sequence, timeout):
+        """Block until frame sequence has been written; False on timeout or once stopped"""
+        with self.new_frame:
+            self.new_frame.wait_for(lambda: self.written > sequence or not self.running, timeout)
+            return self.written > sequence
+
+    def oldest(self):
+        return max(0, self.written - self.capacity)
+
+    def frame(self, sequence):
+        """View of one frame; valid until the ring wraps back around to its slot"""
+        return self.slots[sequence % self.capacity]
+
+    def cut(self, start, end):
+        """Copy frames [start, end) out of the ring, clamped to what it still holds"""
+        return b''.join(self.slots[n % self.capacity] for n in range(max(start, self.oldest()), end))
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2)
+        self.microphone.__exit__(None, None, None)
+
+# ==================== AUDIO OUTPUT ====================
+
+class AudioPlayer:
+    """Long-lived mpg123 in remote-control mode, fed in-memory MP3 buffers through a FIFO"""
+    def __init__(self, open_timeout=2.0):
+        self.open_timeout = open_timeout
+        self.fifo_dir = tempfile.mkdtemp(prefix='alpha-audio-')
+        self.fifo_path = os.path.join(self.fifo_dir, 'clip.mp3')
+        os.mkfifo(self.fifo_path)
+        self.process = None
+        self.clip_ended = threading.Event()
+        self.clips = queue.Queue()
+        # Bumped by stop() so clips queued before it are skipped
+        self.generation = 0
+        self.lock = threading.Lock()
+        self._start_process()
+        self.worker = threading.Thread(target=self._run, name='audio-player', daemon=True)
+        self.worker.start()
+
+    def _start_process(self):
+        self.process = subprocess.Popen(
+            ['mpg123', '-R'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1
+        )
+        threading.Thread(
+            target=self._read_status, args=(self.process,), name='audio-status', daemon=True
+        ).start()
+
+    def _read_status(self, process):
+        """Watch mpg123's status lines for the end of each clip"""
+        for line in process.stdout:
+            if line.startswith('@P 0'):
+                self.clip_ended.set()
+            elif line.startswith('@E'):
+                logger.warning(f"Audio player error: {line[3:].strip()}")
+                self.clip_ended.set()
+        self.clip_ended.set()
+
+    def _command(self, command):
+        self.process.stdin.write(command + '\n')
+        self.process.stdin.flush()
+
+    def _open_fifo(self):
+        """Open the FIFO for writing once mpg123 has opened it for reading"""
+        deadline = time.monotonic() + self.open_timeout
+        while True:
+            try:
+                fd = os.open(self.fifo_path, os.O_WRONLY | os.O_NONBLOCK)
+                os.set_blocking(fd, True)
+                return fd
+            except OSError as e:
+                if e.errno != errno.ENXIO or time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.005)
+
+    def _play_clip(self, audio, generation):
+        with self.lock:
+            if generation != self.generation:
+                return
+            if self.process.poll() is not None:
+                logger.warning("Audio player exited, restarting it")
+                self._start_process()
+            self.clip_ended.clear()
+            self._command(f"LOAD {self.fifo_path}")
+        
+        try:
+            with os.fdopen(self._open_fifo(), 'wb') as fifo:
+                fifo.write(audio)
+        except BrokenPipeError:
+            # stop() cut the clip off part-way through
+            pass
+        while not self.clip_ended.wait(0.1):
+            if self.process.poll() is not None:
+                raise RuntimeError("Audio player exited during playback")
+
+    def _run(self):
+        while True:
+            audio, generation, future = self.clips.get()
+            if audio is None:
+                break
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                self._play_clip(audio, generation)
+                future.set_result(None)
+            except Exception as e:
+                future.set_exception(e)
+
+    def play(self, audio, wait=True):
+        """Queue an MP3 buffer behind any playing clip; with wait, block until it has played"""
+        future = Future()
+        self.clips.put((audio, self.generation, future))
+        if wait:
+            try:
+                future.result()
+            except CancelledError:
+                pass
+        return future
+
+    def stop(self):
+        """Stop the current clip immediately and drop everything queued"""
+        with self.lock:
+            self.generation += 1
+            while True:
+                try:
+                    _, _, future = self.clips.get_nowait()
+                except queue.Empty:
+                    break
+                future.cancel()
+            if self.process.poll() is None:
+                self._command('STOP')
+
+    def close(self):
+        self.stop()
+        self.clips.put((None, None, None))
+        try:
+            self._command('QUIT')
+            self.process.wait(timeout=2)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+        self.worker.join(timeout=2)
+        try:
+            os.unlink(self.fifo_path)
+            os.rmdir(self.fifo_dir)
+        except OSError:
+            pass
+
+# ==================== VOICE ENGINE ====================
+
+class VoiceEngine:
+    """Handles all voice interactions with offline fallback"""
+    def __init__(self, config):
+        self.config = config
+        self.current_language = 'en'
+        self.offline = False
+        self.tts_cache = TTSCache(
+            config.get('PATHS', 'tts_cache', fallback='alpha_data/tts_cache'),
+            max_bytes=config.getint('VOICE', 'tts_cache_mb', fallback=200) * 1024 * 1024
+        )
+        bundle = self.tts_cache.load_bundle(
+            config.get('PATHS', 'audio_bundle', fallback='alpha_data/audio_bundle')
+        )
+        if bundle:
+            logger.info(f"Loaded audio bundle version {bundle['version']} with {len(bundle['entries'])} prompts")
+        self.stream_speech = config.getboolean('VOICE', 'stream_speech', fallback=True)
+        self.stream_chunk_chars = config.getint('VOICE', 'stream_chunk_chars', fallback=200)
+        self.stream_queue_size = config.getint('VOICE', 'stream_queue_size', fallback=2)
+        self.time_to_first_audio = deque(maxlen=100)
+        self.chunk_gaps = deque(maxlen=500)
+        self.speech_interrupted = threading.Event()
+        self.player = None
+        try:
+            self.player = AudioPlayer()
+        except (OSError, AttributeError) as e:
+            logger.warning(f"Persistent audio player unavailable, starting mpg123 per clip: {str(e)}")
+        self.local_asr = None
+        if config.getboolean('VOICE', 'local_asr', fallback=True):
+            self.local_asr = load_local_recognizer(
+                config.get('VOICE', 'vosk_model', fallback='alpha_data/models/vosk-model-small-en-us')
+            )
+        self.local_min_confidence = config.getfloat('VOICE', 'local_min_confidence', fallback=0.6)
+        self.vad = None
+        self.vad_aggressiveness = config.getint('VOICE', 'vad_aggressiveness', fallback=2)
+        if config.getboolean('VOICE', 'vad', fallback=True):
+            self.vad = VoiceActivityDetector(aggressiveness=self.vad_aggressiveness)
+        self.vad_onset_frames = max(1, round(config.getint('VOICE', 'vad_onset_ms', fallback=90) / 30))
+        self.vad_endpoint_frames = max(1, round(config.getint('VOICE', 'vad_endpoint_ms', fallback=500) / 30))
+        self.vad_preroll_frames = max(1, round(config.getint('VOICE', 'vad_preroll_ms', fallback=300) / 30))
+        self.barge_in = False
+        self.barge_in_frames = max(1, round(config.getint('VOICE', 'barge_in_ms', fallback=240) / 30))
+        self.barge_in_min_rms = config.getint('VOICE', 'barge_in_min_rms', fallback=1000)
+        # (first frame, next unread frame) of speech that interrupted a prompt, for the next listen()
+        self.barge_in_mark = None
+        # (endpoint delay, recognition time) per turn, in seconds
+        self.turn_latencies = deque(maxlen=200)
+        self.recognizer = sr.Recognizer()
+        self.microphone = self.select_microphone()
+        self.test_audio_system()
+        
+        # VAD capture reads a microphone that stays open for the whole run
+        self.mic_stream = None
+        if self.vad:
+            try:
+                self.mic_stream = MicrophoneStream(
+                    self.microphone, config.getfloat('VOICE', 'mic_ring_seconds', fallback=10)
+                ).start()
+                self.barge_in = config.getboolean('VOICE', 'barge_in', fallback=True)
+            except Exception as e:
+                logger.warning(f"Could not keep the microphone open, opening it per turn: {str(e)}")
+        
+    def select_microphone(self):
+        """Select USB camera microphone if available"""
+        mics = sr.Microphone.list_microphone_names()
+        logger.info(f"Available microphones: {mics}")
+        
+        # Find USB camera microphone
+        usb_mic_index = None
+        for i, name in enumerate(mics):
+            if 'usb' in name.lower() or 'camera' in name.lower():
+                usb_mic_index = i
+                logger.info(f"Using USB microphone: {name} at index {i}")
+                break
+            elif 'mic' in name.lower() or 'input' in name.lower():
+                usb_mic_index = i  # Fallback to any mic
+                
+        # VAD works on 30 ms frames of 16 kHz audio
+        options = {'sample_rate': 16000, 'chunk_size': 480} if self.vad else {}
+        if usb_mic_index is None:
+            logger.warning("No specific USB microphone found, using default")
+            return sr.Microphone(**options)
+        return sr.Microphone(device_index=usb_mic_index, **options)
+    
+    def test_audio_system(self):
+        """Check if required audio components are available"""
+        try:
+            # Test internet-dependent components
+            render_speech("test", 'en')
+            
+            # Test system audio
+            subprocess.run(['which', 'mpg123'], check=True, 
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            
+            # Calibrate microphone
+            with self.microphone as source:
+                self.recognizer.adjust_for_ambient_noise(source, duration=2)
+            
+            logger.info("Audio system fully operational")
+        except Exception as e:
+            logger.warning(f"Audio system limited: {str(e)}")
+            self.offline = True
+    
+    def set_language(self, language_code):
+        """Set the current language for voice interactions"""
+        if language_code in TRANSLATIONS:
+            self.current_language = language_code
+            logger.info(f"Language set to: {language_code}")
+        else:
+            logger.warning(f"Unsupported language code: {language_code}")
+
+    def synthesize(self, text, lang_code, slow=False):
+        """MP3 audio for text from the cache, else from gTTS; None when offline and uncached"""
+        key = tts_cache_key(text, lang_code, slow)
+        audio = self.tts_cache.get(key)
+        if audio is None and not self.offline:
+            audio = render_speech(text, lang_code, slow)
+            try:
+                self.tts_cache.put(key, audio)
+            except OSError as e:
+                logger.warning(f"Could not cache synthesized speech: {str(e)}")
+        return audio
+
+    def play_audio(self, audio):
+        """Play MP3 bytes on the persistent player, or on a one-off mpg123 without it"""
+        if self.player:
+            self.player.play(audio)
+            return
+        subprocess.run(
+            ['mpg123', '-q', '-'],
+            input=audio,
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+
+    def speech_chunks(self, text):
+        """The pieces speak() synthesizes and plays one after another"""
+        return split_speech(text, self.stream_chunk_chars) if self.stream_speech else [text]
+
+    def speak(self, text, slow=False):
+        """Text-to-speech that synthesizes the next sentence while the current one plays"""
+        chunks = self.speech_chunks(text)
+        self.speech_interrupted.clear()
+        # Only an interruption of this prompt may carry over into the next listen()
+        self.barge_in_mark = None
+        lang_code = TRANSLATIONS[self.current_language]['lang_code']
+        chunk_queue = queue.Queue(maxsize=self.stream_queue_size)
+        stop = threading.Event()
+        
+        def put(item):
+            while not stop.is_set():
+                try:
+                    chunk_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+        
+        def produce():
+            # Uncached sentences while offline, spoken together by one espeak call
+            unrendered = []
+            for chunk in chunks + [None]:
+                # Don't keep synthesizing sentences nobody will hear
+                if stop.is_set():
+                    return
+                audio = None
+                if chunk is not None:
                     try:
-                        text = self.recognizer.recognize_google(audio)
-                        logger.debug(f"Recognized: {text}")
-                        return text.lower()
-                    except sr.UnknownValueError:
-                        logger.warning("Could not understand audio")
-                        return None
-                    except sr.RequestError as e:
-                        logger.warning(f"Speech recognition service error: {str(e)}")
-                        return None
+                        audio = self.synthesize(chunk, lang_code, slow)
+                    except Exception as e:
+                        logger.warning(f"Synthesis failed for {chunk[:40]!r}, falling back to espeak: {str(e)}")
+                    if audio is None and self.offline:
+                        # Offline lookups are instant, so batching costs no latency but saves a fork per sentence
+                        unrendered.append(chunk)
+                        continue
+                if unrendered:
+                    if not put((' '.join(unrendered), None)):
+                        return
+                    unrendered = []
+                if not put((chunk, audio)):
+                    return
+        
+        started = time.monotonic()
+        producer = threading.Thread(target=produce, name='tts-producer', daemon=True)
+        producer.start()
+        monitor = None
+        if self.barge_in and self.mic_stream:
+            monitor = threading.Thread(target=self._watch_for_barge_in, args=(stop,), name='barge-in', daemon=True)
+            monitor.start()
+        failures = 0
+        first_audio = None
+        gaps = []
+        last_end = None
+        try:
+            while not self.speech_interrupted.is_set():
+                try:
+                    chunk, audio = chunk_queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if chunk is None or self.speech_interrupted.is_set():
+                    break
+                now = time.monotonic()
+                if first_audio is None:
+                    first_audio = now - started
                 else:
-                    # Offline fallback - basic voice recording without recognition
-                    with tempfile.NamedTemporaryFile(suffix=".wav", delete=True) as f:
-                        with open(f.name, "wb") as audio_file:
-                            audio_file.write(audio.get_wav_data())
-                        logger.info("Audio captured in offline mode")
-                        return "offline_audio_captured"
+                    gaps.append(now - last_end)
+                try:
+                    self._play_chunk(chunk, audio)
+                except Exception as e:
+                    failures += 1
+                    logger.error(f"Speech synthesis failed: {str(e)}")
+                last_end = time.monotonic()
+        finally:
+            stop.set()
+            # After an interruption the producer exits once its current synthesis returns
+            if not self.speech_interrupted.is_set():
+                producer.join()
+            if monitor:
+                monitor.join()
+        
+        if first_audio is not None:
+            self.time_to_first_audio.append(first_audio)
+            self.chunk_gaps.extend(gaps)
+            logger.info(
+                f"Spoke {len(chunks)} chunks: first audio after {first_audio:.2f}s, "
+                f"max gap {max(gaps, default=0.0):.2f}s"
+            )
+        if failures and failures == len(chunks):
+            raise RuntimeError("Speech output failed for every chunk")
+
+    def _play_chunk(self, text, audio):
+        """Play synthesized audio, with espeak as the offline fallback"""
+        if audio is not None:
+            try:
+                self.play_audio(audio)
+                return
+            except (OSError, subprocess.CalledProcessError) as e:
+                # Offline mode may mean mpg123 itself is missing
+                if not self.offline:
+                    raise
+                logger.warning(f"Cached audio playback failed, using espeak: {str(e)}")
+        
+        # Fallback to espeak if available
+        try:
+            subprocess.run(
+                ['espeak', '-v', self.current_language, text],
+                check=True
+            )
+        except:
+            # Final fallback - just print
+            print(f"SPEAK: {text}")
+
+    def _watch_for_barge_in(self, stop):
+        """Stop playback as soon as the visitor talks over the robot"""
+        # A louder floor than listen() uses keeps the prompt's own echo from triggering this
+        detector = VoiceActivityDetector(aggressiveness=self.vad_aggressiveness, min_rms=self.barge_in_min_rms)
+        stream = self.mic_stream
+        cursor = stream.written
+        run = 0
+        while not stop.is_set():
+            if not stream.wait(cursor, timeout=0.1):
+                if not stream.running:
+                    logger.warning("Barge-in monitor stopped: microphone stream ended")
+                    return
+                continue
+            cursor = max(cursor, stream.oldest())
+            run = run + 1 if detector.is_speech(stream.frame(cursor)) else 0
+            cursor += 1
+            if run >= self.barge_in_frames:
+                logger.info("Barge-in: visitor started talking, stopping the prompt")
+                self.barge_in_mark = (cursor - run - self.vad_preroll_frames, cursor)
+                self.stop_speaking()
+                return
+
+    def stop_speaking(self):
+        """Cut off the current utterance and anything queued behind it"""
+        self.speech_interrupted.set()
+        if self.player:
+            self.player.stop()
+
+    def close(self):
+        if self.player:
+            self.player.close()
+            self.player = None
+        self._drop_mic_stream()
+
+    def _drop_mic_stream(self):
+        """Stop the always-open microphone; listen() then opens it per turn and barge-in is off"""
+        stream, self.mic_stream = self.mic_stream, None
+        self.barge_in = False
+        self.barge_in_mark = None
+        if stream:
+            try:
+                stream.stop()
+            except Exception as e:
+                logger.warning(f"Closing the microphone stream failed: {str(e)}")
+
+    def speech_stats(self):
+        """Time-to-first-audio and inter-chunk gap statistics in seconds"""
+        first = np.array(self.time_to_first_audio) if self.time_to_first_audio else np.zeros(1)
+        gaps = np.array(self.chunk_gaps) if self.chunk_gaps else np.zeros(1)
+        return {
+            'utterances': len(self.time_to_first_audio),
+            'first_audio_mean': float(first.mean()),
+            'first_audio_p95': float(np.percentile(first, 95)),
+            'gap_mean': float(gaps.mean()),
+            'gap_max': float(gaps.max())
+        }
+
+    def listen(self, timeout=5, phrase_time_limit=10, expect=None):
+        """Speech recognition; expect names a grammar or lists the answers this turn accepts"""
+        try:
+            if self.mic_stream and not self.mic_stream.running:
+                logger.warning("Microphone stream ended, opening the microphone per turn from now on")
+                self._drop_mic_stream()
+            if self.mic_stream:
+                logger.debug("Listening...")
+                audio, endpoint_delay = self._capture_utterance(timeout, phrase_time_limit)
+            else:
+                with self.microphone as source:
+                    logger.debug("Listening...")
+                    audio = self.recognizer.listen(
+                        source,
+                        timeout=timeout,
+                        phrase_time_limit=phrase_time_limit
+                    )
+                # The energy endpointer always waits out pause_threshold of silence
+                endpoint_delay = self.recognizer.pause_threshold
+            
+            started = time.monotonic()
+            text = self.transcribe(audio, expect)
+            recognition = time.monotonic() - started
+            self.turn_latencies.append((endpoint_delay, recognition))
+            logger.info(
+                f"Turn latency: endpoint {endpoint_delay:.2f}s + recognition {recognition:.2f}s "
+                f"= {endpoint_delay + recognition:.2f}s after speech ended"
+            )
+            return text
                     
         except sr.WaitTimeoutError:
             logger.warning("Listening timeout reached")
             return None
         except Exception as e:
-            logger.error(f"Listening failed: {str(e)}")
-            return None
+            logger.error(f"Listening failed: {str(e)}")
+            return None
+
+    def _capture_utterance(self, timeout, phrase_time_limit):
+        """Cut one utterance out of the microphone ring, ending it vad_endpoint_ms after speech stops"""
+        stream = self.mic_stream
+        cursor = stream.written
+        start = None
+        speech_started = None
+        mark, self.barge_in_mark = self.barge_in_mark, None
+        if mark and mark[0] >= stream.oldest():
+            # The visitor is already talking: they interrupted the prompt
+            start, cursor = mark
+            speech_started = time.monotonic()
+        elif mark:
+            logger.debug("Ignoring a barge-in mark the microphone ring has already overwritten")
+        
+        started = time.monotonic()
+        onset = 0
+        silence = 0
+        while True:
+            is_speech = None
+            if stream.wait(cursor, timeout=0.5):
+                cursor = max(cursor, stream.oldest())
+                is_speech = self.vad.is_speech(stream.frame(cursor))
+                cursor += 1
+            elif not stream.running:
+                raise RuntimeError("Microphone stream stopped")
+            now = time.monotonic()
+            
+            if start is None:
+                onset = onset + 1 if is_speech else (onset if is_speech is None else 0)
+                if onset >= self.vad_onset_frames:
+                    # Pre-roll may reach back before listen() was called
+                    start = cursor - onset - self.vad_preroll_frames
+                    speech_started = now
+                elif timeout and now - started > timeout:
+                    raise sr.WaitTimeoutError("listening timed out while waiting for phrase to start")
+                continue
+            
+            if is_speech is not None:
+                silence = 0 if is_speech else silence + 1
+            if silence >= self.vad_endpoint_frames:
+                break
+            if phrase_time_limit and now - speech_started > phrase_time_limit:
+                break
+        
+        # Keep a little trailing silence so the recognizer sees the word end
+        end = cursor - max(0, silence - 3)
+        audio = sr.AudioData(stream.cut(start, end), stream.sample_rate, stream.sample_width)
+        return audio, silence * stream.frame_seconds
+
+    def listen_stats(self):
+        """Mean per-turn endpoint delay and recognition time in seconds"""
+        if not self.turn_latencies:
+            return {'turns': 0}
+        endpoint, recognition = np.mean(np.array(self.turn_latencies), axis=0)
+        return {
+            'turns': len(self.turn_latencies),
+            'vad': self.vad is not None,
+            'endpoint_mean': float(endpoint),
+            'recognition_mean': float(recognition),
+            'turn_mean': float(endpoint + recognition)
+        }
+
+    def transcribe(self, audio, expect=None):
+        """Local grammar-constrained pass first, then Google when online"""
+        phrases = resolve_grammar(expect)
+        # Free-form answers (names, email) need the cloud model unless we're offline
+        if self.local_asr and (self.offline or phrases):
+            started = time.monotonic()
+            text, confidence = self.local_asr.recognize(
+                audio.get_raw_data(convert_rate=self.local_asr.sample_rate, convert_width=2), phrases
+            )
+            logger.info(
+                f"Local recognition: {text!r} (confidence {confidence:.2f}) "
+                f"in {1000 * (time.monotonic() - started):.0f} ms"
+            )
+            if text and (self.offline or confidence >= self.local_min_confidence):
+                return text
+        
+        if self.offline:
+            if not self.local_asr:
+                logger.warning("No local speech model, can't recognize speech offline")
+            return None
+        try:
+            text = self.recognizer.recognize_google(audio)
+            logger.debug(f"Recognized: {text}")
+            return text.lower()
+        except sr.UnknownValueError:
+            logger.warning("Could not understand audio")
+            return None
+        except sr.RequestError as e:
+            logger.warning(f"Speech recognition service error: {str(e)}")
+            return None
+
+# ==================== CAMERA STREAM ====================
+
+class CameraStream:
+    """Background reader that keeps the freshest camera frames in a ring buffer"""
+    def __init__(self, camera, ring_size=4):
+        self.camera = camera
+        self.ring_size = ring_size
+        self.frames = None
+        self.timestamps = np.zeros(ring_size)
+        self.latest_slot = -1
+        self.sequence = 0
+        self.frame_count = 0
+        self.dropped_frames = 0
+        self.read_failures = 0
+        self.consecutive_failures = 0
+        self.capture_fps = 0.0
+        self.failed = False
+        # Seconds between decoded frames; frames in between are grabbed but never decoded
+        self.decode_interval = 0.0
+        self.running = False
+        self.thread = None
+        self.new_frame = threading.Condition()
+
+    def start(self):
+        """Start draining the device on a daemon thread"""
+        self.running = True
+        self.failed = False
+        self.thread = threading.Thread(target=self._run, name="camera-stream", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2)
+            self.thread = None
+
+    def _run(self):
+        last_timestamp = None
+        last_decode = 0.0
+        while self.running:
+            slot = (self.latest_slot + 1) % self.ring_size
+            skip = self.decode_interval and time.monotonic() - last_decode < self.decode_interval
+            if skip:
+                # Keep the driver queue drained without paying for a decode
+                ret, frame = self.camera.grab(), None
+            elif self.frames is None:
+                ret, frame = self.camera.read()
+            else:
+                # Decode straight into the preallocated slot
+                ret, frame = self.camera.read(self.frames[slot])
+            now = time.monotonic()
+            
+            if not ret:
+                self.read_failures += 1
+                self.consecutive_failures += 1
+                if self.consecutive_failures >= 10:
+                    logger.error("Camera stream stopped after repeated read failures")
+                    self.failed = True
+                    self.running = False
+                    with self.new_frame:
+                        self.new_frame.notify_all()
+                    return
+                time.sleep(0.05)
+                continue
+            self.consecutive_failures = 0
+            if skip:
+                # The next decoded frame is not a gap in capture
+                last_timestamp = None
+                continue
+            last_decode = now
+            
+            if self.frames is None or frame.shape != self.frames.shape[1:]:
+                self.frames = np.empty((self.ring_size,) + frame.shape, dtype=frame.dtype)
+                self.frames[slot] = frame
+            elif frame is not self.frames[slot] and not np.shares_memory(frame, self.frames[slot]):
+                self.frames[slot] = frame
+            
+            if last_timestamp is not None:
+                interval = now - last_timestamp
+                if self.capture_fps:
+                    # Gaps well beyond the running frame interval mean the device skipped frames
+                    missed = int(round(interval * self.capture_fps)) - 1
+                    if missed > 0:
+                        self.dropped_frames += missed
+                    self.capture_fps = 0.9 * self.capture_fps + 0.1 / max(interval, 1e-6)
+                else:
+                    self.capture_fps = 1.0 / max(interval, 1e-6)
+            last_timestamp = now
+            
+            with self.new_frame:
+                self.timestamps[slot] = now
+                self.latest_slot = slot
+                self.sequence += 1
+                self.frame_count += 1
+                self.new_frame.notify_all()
+
+    def latest(self, out=None, after=0, timeout=1.0):
+        """Copy the newest frame with sequence > after into out; returns (frame, timestamp, sequence)"""
+        with self.new_frame:
+            if not self.new_frame.wait_for(lambda: self.sequence > after or self.failed, timeout=timeout):
+                return None, None, self.sequence
+            if self.sequence <= after:
+                return None, None, self.sequence
+            slot = self.latest_slot
+            if out is None or out.shape != self.frames.shape[1:]:
+                out = self.frames[slot].copy()
+            else:
+                np.copyto(out, self.frames[slot])
+            return out, self.timestamps[slot], self.sequence
+
+    def stats(self):
+        return {
+            'frames': self.frame_count,
+            'dropped_frames': self.dropped_frames,
+            'read_failures': self.read_failures,
+            'capture_fps': round(self.capture_fps, 1)
+        }
+
+def _read_sysfs(path):
+    try:
+        return Path(path).read_text().strip()
+    except OSError:
+        return None
+
+def enumerate_video_devices(sysfs_root='/sys/class/video4linux'):
+    """List V4L2 capture nodes with a stable identity, without opening any device"""
+    root = Path(sysfs_root)
+    if not root.is_dir():
+        return []
+    
+    devices = []
+    for node in sorted(root.glob('video*'), key=lambda p: int(re.sub(r'\D', '', p.name) or 0)):
+        # Index 0 is the capture node; UVC cameras add metadata nodes with index 1
+        if _read_sysfs(node / 'index') not in (None, '0'):
+            continue
+        identity = {'name': _read_sysfs(node / 'name')}
+        device_link = node / 'device'
+        if device_link.exists():
+            # device points at the USB interface; its parent is the USB device
+            usb_device = device_link.resolve().parent
+            identity.update({
+                'bus_path': usb_device.name,
+                'vendor': _read_sysfs(usb_device / 'idVendor'),
+                'product': _read_sysfs(usb_device / 'idProduct'),
+                'serial': _read_sysfs(usb_device / 'serial')
+            })
+        devices.append({'device': f"/dev/{node.name}", 'identity': identity})
+    return devices
+
+def find_cached_camera(cached, devices):
+    """Locate the cached camera among current nodes, whose numbering may have changed"""
+    identity = cached.get('identity') or {}
+    for key in ('serial', 'bus_path'):
+        if identity.get(key):
+            for device in devices:
+                if (device['identity'].get(key) == identity[key]
+                        and device['identity'].get('product') == identity.get('product')):
+                    return device['device']
+    return cached.get('device')
+
+def fourcc_to_str(value):
+    value = int(value)
+    return ''.join(chr((value >> (8 * i)) & 0xFF) for i in range(4))
+
+def configure_camera(camera, width, height, fps=None, fourcc=None, buffer_size=None):
+    """Request capture settings from the driver and return what it actually granted"""
+    # V4L2 only honours the pixel format if it is set before the frame size
+    if fourcc:
+        camera.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+    camera.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    camera.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    if fps:
+        camera.set(cv2.CAP_PROP_FPS, fps)
+    if buffer_size:
+        camera.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+    
+    granted = {
+        'width': int(camera.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        'height': int(camera.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        'fps': camera.get(cv2.CAP_PROP_FPS),
+        'fourcc': fourcc_to_str(camera.get(cv2.CAP_PROP_FOURCC)),
+        'buffer_size': int(camera.get(cv2.CAP_PROP_BUFFERSIZE))
+    }
+    requested = {'width': width, 'height': height, 'fps': fps, 'fourcc': fourcc}
+    mismatched = {
+        key: (value, granted[key]) for key, value in requested.items()
+        if value and granted[key] != value
+    }
+    if mismatched:
+        logger.warning(f"Camera driver adjusted settings (requested, granted): {mismatched}")
+    return granted
+
+# ==================== FACE DETECTORS ====================
+
+class FaceDetector:
+    """Face detection backend returning (top, right, bottom, left) boxes"""
+    name = None
+    grayscale = False
+
+    def detect(self, image):
+        raise NotImplementedError
+
+class HogDetector(FaceDetector):
+    """dlib HOG detector via face_recognition"""
+    name = 'hog'
+    grayscale = True
+
+    def detect(self, image):
+        return face_recognition.face_locations(image, model='hog')
+
+class CnnDetector(FaceDetector):
+    """dlib CNN (MMOD) detector via face_recognition, run on the CPU"""
+    name = 'cnn'
+
+    def detect(self, image):
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        return face_recognition.face_locations(rgb, model='cnn')
+
+class HaarDetector(FaceDetector):
+    """OpenCV Haar cascade detector"""
+    name = 'haar'
+    grayscale = True
+
+    def __init__(self, cascade_path=None):
+        cascade_path = cascade_path or os.path.join(
+            cv2.data.haarcascades, 'haarcascade_frontalface_default.xml'
+        )
+        self.cascade = cv2.CascadeClassifier(cascade_path)
+        if self.cascade.empty():
+            raise RuntimeError(f"Could not load Haar cascade from {cascade_path}")
+
+    def detect(self, image):
+        faces = self.cascade.detectMultiScale(image, scaleFactor=1.1, minNeighbors=5, minSize=(20, 20))
+        return [(int(y), int(x + w), int(y + h), int(x)) for x, y, w, h in faces]
+
+class DnnDetector(FaceDetector):
+    """OpenCV DNN detector using the res10 300x300 SSD Caffe model"""
+    name = 'dnn'
+
+    def __init__(self, prototxt, model, confidence=0.5):
+        if not (prototxt and model and Path(prototxt).exists() and Path(model).exists()):
+            raise RuntimeError("res10 SSD model files not found")
+        self.net = cv2.dnn.readNetFromCaffe(prototxt, model)
+        self.confidence = confidence
+
+    def detect(self, image):
+        height, width = image.shape[:2]
+        blob = cv2.dnn.blobFromImage(
+            cv2.resize(image, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0)
+        )
+        self.net.setInput(blob)
+        detections = self.net.forward()[0, 0]
+        boxes = []
+        for detection in detections[detections[:, 2] >= self.confidence]:
+            left, top, right, bottom = detection[3:7] * np.array([width, height, width, height])
+            boxes.append(scale_face_box((top, right, bottom, left), 1.0, image.shape))
+        return boxes
+
+def create_face_detector(name, config):
+    """Instantiate a detector backend by name"""
+    if name == 'hog':
+        return HogDetector()
+    if name == 'cnn':
+        return CnnDetector()
+    if name == 'haar':
+        return HaarDetector(config.get('DETECTOR', 'haar_cascade', fallback=None))
+    if name == 'dnn':
+        return DnnDetector(
+            config.get('DETECTOR', 'dnn_prototxt', fallback=None),
+            config.get('DETECTOR', 'dnn_model', fallback=None),
+            config.getfloat('DETECTOR', 'dnn_confidence', fallback=0.5)
+        )
+    raise ValueError(f"Unknown face detector backend: {name}")
+
+def select_face_detector(config, frames, scale=1.0):
+    """Pick the fastest backend whose recall on sample frames meets the threshold; None without faces"""
+    backend = config.get('DETECTOR', 'backend', fallback='auto')
+    if backend != 'auto':
+        try:
+            return create_face_detector(backend, config)
+        except Exception as e:
+            logger.warning(f"Face detector '{backend}' unavailable, using HOG: {str(e)}")
+            return HogDetector()
+    
+    min_recall = config.getfloat('DETECTOR', 'min_recall', fallback=0.9)
+    candidates = [
+        name.strip() for name in config.get('DETECTOR', 'candidates', fallback='hog,haar,dnn,cnn').split(',')
+    ]
+    reference_name = config.get('DETECTOR', 'reference', fallback='hog')
+    
+    try:
+        reference_detector = create_face_detector(reference_name, config)
+        reference = [detect_faces(frame, 1.0, reference_detector) for frame in frames]
+    except Exception as e:
+        logger.warning(f"Face detector benchmark reference unavailable: {str(e)}")
+        reference = []
+    total = sum(len(boxes) for boxes in reference)
+    if not total:
+        logger.info("No faces in benchmark frames, can't compare face detectors yet")
+        return None
+    
+    results = []
+    for name in candidates:
+        try:
+            detector = create_face_detector(name, config)
+            elapsed = 0.0
+            matched = 0
+            for frame, ref_boxes in zip(frames, reference):
+                start = time.perf_counter()
+                boxes = detect_faces(frame, scale, detector)
+                elapsed += time.perf_counter() - start
+                matched += sum(
+                    1 for ref_box in ref_boxes
+                    if any(face_box_iou(box, ref_box) >= 0.4 for box in boxes)
+                )
+        except Exception as e:
+            logger.info(f"Face detector '{name}' skipped: {str(e)}")
+            continue
+        
+        latency_ms = 1000 * elapsed / len(frames)
+        recall = matched / total
+        logger.info(f"Face detector '{name}': {latency_ms:.1f} ms/frame, recall {recall:.0%}")
+        results.append((recall >= min_recall, -latency_ms if recall >= min_recall else recall, detector))
+    
+    if not results:
+        return HogDetector()
+    _, _, chosen = max(results, key=lambda result: (result[0], result[1]))
+    logger.info(f"Selected face detector '{chosen.name}' (min recall {min_recall:.0%})")
+    return chosen
 
 # ==================== FACE RECOGNITION ====================
 
+def scale_face_box(box, factor, frame_shape):
+    """Scale a (top, right, bottom, left) box and clip it to the frame"""
+    height, width = frame_shape[:2]
+    top, right, bottom, left = box
+    return (
+        max(0, int(round(top * factor))),
+        min(width, int(round(right * factor))),
+        min(height, int(round(bottom * factor))),
+        max(0, int(round(left * factor)))
+    )
+
+def face_box_area(box):
+    top, right, bottom, left = box
+    return max(0, bottom - top) * max(0, right - left)
+
+def face_box_iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes"""
+    inter = face_box_area((max(a[0], b[0]), min(a[1], b[1]), min(a[2], b[2]), max(a[3], b[3])))
+    union = face_box_area(a) + face_box_area(b) - inter
+    return inter / union if union else 0.0
+
+def detect_faces(frame, scale=1.0, detector=None):
+    """Run detection on a downscaled copy; boxes are in full-frame coordinates"""
+    detector = detector or HogDetector()
+    image = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if detector.grayscale else frame
+    if scale < 1.0:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return [
+        scale_face_box(box, 1.0 / scale, frame.shape)
+        for box in detector.detect(image)
+    ]
+
+def encode_face(frame, box, margin=0.5):
+    """Encode one face at full resolution from a crop around its box"""
+    top, right, bottom, left = box
+    pad_y = int((bottom - top) * margin)
+    pad_x = int((right - left) * margin)
+    height, width = frame.shape[:2]
+    y0, y1 = max(0, top - pad_y), min(height, bottom + pad_y)
+    x0, x1 = max(0, left - pad_x), min(width, right + pad_x)
+    
+    crop = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2RGB)
+    encodings = face_recognition.face_encodings(crop, [(top - y0, right - x0, bottom - y0, left - x0)])
+    return encodings[0] if encodings else None
+
+def create_face_tracker():
+    """Return the fastest OpenCV tracker this build provides, or None"""
+    # MOSSE and KCF need opencv-contrib; MIL ships with the main package
+    for factory in ('TrackerMOSSE_create', 'TrackerKCF_create', 'TrackerMIL_create'):
+        for namespace in (getattr(cv2, 'legacy', None), cv2):
+            if namespace is not None and hasattr(namespace, factory):
+                return getattr(namespace, factory)()
+    return None
+
+def face_frontalness(frame, box):
+    """Score 0..1 for how squarely the face looks at the camera, from 5-point landmarks"""
+    top, right, bottom, left = box
+    if bottom <= top or right <= left:
+        return 0.0
+    crop = cv2.cvtColor(frame[top:bottom, left:right], cv2.COLOR_BGR2RGB)
+    landmarks = face_recognition.face_landmarks(
+        crop, [(0, right - left, bottom - top, 0)], model='small'
+    )
+    if not landmarks:
+        return 0.0
+    points = landmarks[0]
+    nose_x = np.mean([x for x, _ in points['nose_tip']])
+    left_eye_x = np.mean([x for x, _ in points['left_eye']])
+    right_eye_x = np.mean([x for x, _ in points['right_eye']])
+    # A frontal face has the nose midway between the eyes
+    left_span = abs(nose_x - left_eye_x)
+    right_span = abs(right_eye_x - nose_x)
+    return 1.0 - abs(left_span - right_span) / max(left_span + right_span, 1e-6)
+
+def face_quality(frame, box, frontalness, target_size=160):
+    """Combine sharpness, size and frontalness into a 0..1 quality score"""
+    top, right, bottom, left = box
+    if bottom <= top or right <= left:
+        return 0.0
+    gray = cv2.cvtColor(frame[top:bottom, left:right], cv2.COLOR_BGR2GRAY)
+    gray = cv2.resize(gray, (96, 96), interpolation=cv2.INTER_AREA)
+    sharpness = cv2.Laplacian(gray, cv2.CV_64F).var()
+    sharpness_score = sharpness / (sharpness + 100.0)
+    size_score = min(1.0, (bottom - top) / target_size)
+    return sharpness_score * size_score * frontalness
+
+def benchmark_detection_scales(frames, scales=(1.0, 0.5, 0.33, 0.25)):
+    """Measure detection latency and agreement with full-resolution detection per scale"""
+    reference = [detect_faces(frame, 1.0) for frame in frames]
+    reference_encodings = [
+        [encode_face(frame, box) for box in boxes]
+        for frame, boxes in zip(frames, reference)
+    ]
+    
+    results = []
+    for scale in scales:
+        elapsed = 0.0
+        matched = 0
+        drift = []
+        for frame, ref_boxes, ref_encodings in zip(frames, reference, reference_encodings):
+            start = time.perf_counter()
+            boxes = detect_faces(frame, scale)
+            elapsed += time.perf_counter() - start
+            
+            for ref_box, ref_encoding in zip(ref_boxes, ref_encodings):
+                best = max(boxes, key=lambda box: face_box_iou(box, ref_box), default=None)
+                if best is None or face_box_iou(best, ref_box) < 0.5:
+                    continue
+                matched += 1
+                encoding = encode_face(frame, best)
+                if encoding is not None and ref_encoding is not None:
+                    drift.append(float(np.linalg.norm(encoding - ref_encoding)))
+        
+        total = sum(len(boxes) for boxes in reference)
+        results.append({
+            'scale': scale,
+            'latency_ms': 1000 * elapsed / max(1, len(frames)),
+            'recall': matched / total if total else float('nan'),
+            'encoding_drift': float(np.mean(drift)) if drift else float('nan')
+        })
+    return results
+
+
+# ==================== FACE PROCESSING WORKERS ====================
+
+# Per-process state of a face worker: detectors and attached shared-memory slots
+_face_worker_state = {}
+
+def _face_worker_init(config_sections):
+    """Load the dlib models once so every request on this worker runs warm"""
+    config = configparser.ConfigParser()
+    config.read_dict(config_sections)
+    _face_worker_state['config'] = config
+    _face_worker_state['detectors'] = {}
+    _face_worker_state['slots'] = {}
+    blank = np.zeros((160, 160, 3), dtype=np.uint8)
+    face_recognition.face_locations(blank[:, :, 0], model='hog')
+    face_recognition.face_encodings(blank, [(8, 152, 152, 8)])
+
+def _face_worker_ready():
+    return os.getpid()
+
+def _face_worker_task(slot_name, shape, dtype, operation, args):
+    """Run one detection or encoding request on a frame held in shared memory"""
+    slot = _face_worker_state['slots'].get(slot_name)
+    if slot is None:
+        slot = shared_memory.SharedMemory(name=slot_name)
+        _face_worker_state['slots'][slot_name] = slot
+    frame = np.ndarray(shape, dtype=dtype, buffer=slot.buf)
+    
+    if operation == 'detect':
+        backend, scale = args
+        detectors = _face_worker_state['detectors']
+        if backend not in detectors:
+            detectors[backend] = create_face_detector(backend, _face_worker_state['config'])
+        return detect_faces(frame, scale, detectors[backend])
+    if operation == 'encode':
+        return [encode_face(frame, box) for box in args]
+    if operation == 'encode_all':
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        return face_recognition.face_encodings(rgb, args)
+    raise ValueError(f"Unknown face worker operation: {operation}")
+
+class FaceProcessingService:
+    """Pool of warm face worker processes fed with frames through shared memory"""
+    def __init__(self, config, slot_bytes, workers=2, queue_depth=4):
+        sections = {
+            name: dict(config[name]) for name in ('DETECTOR',) if config.has_section(name)
+        }
+        self.slot_bytes = slot_bytes
+        self.slots = []
+        self.free_slots = queue.Queue()
+        # Spawned workers don't inherit the camera and audio threads of this process
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_face_worker_init,
+            initargs=(sections,)
+        )
+        try:
+            for _ in range(queue_depth):
+                slot = shared_memory.SharedMemory(create=True, size=slot_bytes)
+                self.slots.append(slot)
+                self.free_slots.put(slot)
+        except Exception:
+            self.close()
+            raise
+        # Start every worker now so model loading overlaps with the rest of startup
+        for _ in range(workers):
+            self.executor.submit(_face_worker_ready)
+        logger.info(f"Face processing service: {workers} workers, {queue_depth} frame slots")
+
+    def submit(self, frame, operation, args, timeout=None):
+        """Copy a frame into a free slot and queue work on it; blocks while the queue is full"""
+        if frame.nbytes > self.slot_bytes:
+            raise ValueError(f"Frame of {frame.nbytes} bytes exceeds the {self.slot_bytes} byte slot")
+        slot = self.free_slots.get(timeout=timeout)
+        try:
+            np.ndarray(frame.shape, dtype=frame.dtype, buffer=slot.buf)[...] = frame
+            future = self.executor.submit(
+                _face_worker_task, slot.name, frame.shape, frame.dtype.str, operation, args
+            )
+        except Exception:
+            self.free_slots.put(slot)
+            raise
+        future.add_done_callback(lambda _: self.free_slots.put(slot))
+        return future
+
+    def detect(self, frame, backend, scale=1.0):
+        return self.submit(frame, 'detect', (backend, scale))
+
+    def encode(self, frame, boxes):
+        return self.submit(frame, 'encode', list(boxes))
+
+    def encode_all(self, frame, boxes):
+        return self.submit(frame, 'encode_all', list(boxes))
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        for slot in self.slots:
+            slot.close()
+            slot.unlink()
+        self.slots = []
+
 class FaceRecognition:
     """Handles face capture and recognition"""
     def __init__(self, config):
         self.config = config
         self.camera = None
+        self.stream = None
+        self.frame_buffer = None
+        self.detection_scale = config.getfloat('CAMERA', 'detection_scale', fallback=0.25)
+        self.capture_window = config.getfloat('CAMERA', 'capture_window', fallback=1.5)
+        self.detect_every = config.getint('CAMERA', 'detect_every', fallback=3)
+        self.quality_target = config.getfloat('CAMERA', 'quality_target', fallback=0.8)
+        self.quality_face_size = config.getint('CAMERA', 'quality_face_size', fallback=160)
+        self.best_frame_buffer = None
+        self.capture_settings = self._camera_profile('capture')
+        self.preview_settings = self._camera_profile('preview')
+        self.dual_stream = (
+            (self.preview_settings['width'], self.preview_settings['height'])
+            != (self.capture_settings['width'], self.capture_settings['height'])
+        )
+        self.profile = None
+        self.camera_capabilities = {}
+        self.camera_lock = threading.Lock()
         self.setup_camera()
+        sample_frames = self._detector_sample_frames()
+        self.detector = select_face_detector(
+            config, sample_frames, self._detection_scale_for(sample_frames[0]) if sample_frames else 1.0
+        )
+        # An empty kiosk gives faceless startup frames: use HOG and benchmark on captured faces later
+        self.detector_samples = None
+        if self.detector is None:
+            self.detector = HogDetector()
+            self.detector_samples = []
+        self.service = self._start_processing_service()
+        self.capture_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='face-capture')
         
     def setup_camera(self):
-        """Initialize camera with error handling"""
-        # Try different camera indices
-        for i in range(0, 4):
-            try:
-                self.camera = cv2.VideoCapture(i)
-                if self.camera.isOpened():
-                    # Set camera properties
-                    width = int(self.config['CAMERA']['width'])
-                    height = int(self.config['CAMERA']['height'])
-                    self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-                    self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
-                    
-                    # Test camera
-                    ret, frame = self.camera.read()
-                    if ret:
-                        logger.info(f"Camera initialized successfully at index {i}")
-                        return
-                    else:
-                        logger.warning(f"Camera at index {i} opened but couldn't capture frame")
-                        self.camera.release()
-                else:
-                    logger.warning(f"Could not open camera at index {i}")
-            except Exception as e:
-                logger.warning(f"Camera test at index {i} failed: {str(e)}")
+        """Open the camera, trying the cached device first and probing only on failure"""
+        self.stop_stream()
+        devices = enumerate_video_devices()
+        cached = self._load_camera_cache()
         
-        # Try device paths if indices failed
-        device_paths = ["/dev/video0", "/dev/video1", "/dev/video2"]
-        for path in device_paths:
-            try:
-                self.camera = cv2.VideoCapture(path)
-                if self.camera.isOpened():
-                    width = int(self.config['CAMERA']['width'])
-                    height = int(self.config['CAMERA']['height'])
-                    self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-                    self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
-                    
-                    ret, frame = self.camera.read()
-                    if ret:
-                        logger.info(f"Camera initialized at path {path}")
-                        return
-                    else:
-                        logger.warning(f"Camera at path {path} opened but couldn't capture frame")
-                        self.camera.release()
-                else:
-                    logger.warning(f"Could not open camera at path {path}")
-            except Exception as e:
-                logger.warning(f"Camera test at path {path} failed: {str(e)}")
+        candidates = []
+        if cached:
+            candidates.append(find_cached_camera(cached, devices))
+        if devices:
+            candidates.extend(device['device'] for device in devices)
+        else:
+            # No sysfs (non-Linux): fall back to probing indices and device paths
+            candidates.extend([0, 1, 2, 3, "/dev/video0", "/dev/video1", "/dev/video2"])
+        
+        tried = set()
+        for source in candidates:
+            if source in tried:
+                continue
+            tried.add(source)
+            if self._open_camera(source):
+                identity = next((d['identity'] for d in devices if d['device'] == source), None)
+                self._save_camera_cache(source, identity)
+                return
         
         logger.error("All camera initialization attempts failed")
         self.camera = None
         raise RuntimeError("Could not open any camera")
 
-    def capture_face(self):
-        """Capture and encode a face from the camera"""
+    def _open_camera(self, source):
+        """Open and test one camera source, starting the stream on success"""
         try:
-            if not self.camera:
-                # Try to reinitialize camera once
-                try:
-                    self.setup_camera()
-                    if not self.camera:
-                        raise ValueError("Camera not available")
-                except:
-                    raise ValueError("Camera not available")
+            self.camera = cv2.VideoCapture(source)
+            if self.camera.isOpened():
+                self.profile = None
+                self.apply_camera_profile('preview' if self.dual_stream else 'capture')
                 
-            ret, frame = self.camera.read()
-            if not ret:
-                # Try reopening the camera
-                self.camera.release()
-                self.setup_camera()
+                # Test camera
                 ret, frame = self.camera.read()
-                if not ret:
-                    raise ValueError("Could not capture frame after retry")
+                if ret:
+                    logger.info(f"Camera initialized at {source}")
+                    self.start_stream()
+                    return True
+                logger.warning(f"Camera at {source} opened but couldn't capture frame")
+                self.camera.release()
+            else:
+                logger.warning(f"Could not open camera at {source}")
+        except Exception as e:
+            logger.warning(f"Camera test at {source} failed: {str(e)}")
+        return False
+
+    def _camera_cache_path(self):
+        return Path(self.config.get(
+            'PATHS', 'camera_cache',
+            fallback=str(Path(self.config['PATHS']['offline_db']).parent / 'camera_cache.json')
+        ))
+
+    def _load_camera_cache(self):
+        try:
+            with open(self._camera_cache_path()) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_camera_cache(self, source, identity):
+        """Remember the working device, its identity and granted capabilities"""
+        path = self._camera_cache_path()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(path.name + '.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump({
+                    'device': source,
+                    'identity': identity,
+                    'capabilities': self.camera_capabilities
+                }, f, indent=2)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not save camera cache: {str(e)}")
+
+    def _camera_profile(self, name):
+        """Requested camera settings for the 'capture' or 'preview' profile"""
+        camera = self.config['CAMERA']
+        settings = {
+            'width': camera.getint('width', fallback=1280),
+            'height': camera.getint('height', fallback=720),
+            'fps': camera.getfloat('fps', fallback=30),
+            'fourcc': camera.get('fourcc', fallback='MJPG') or None,
+            'buffer_size': camera.getint('buffer_size', fallback=1)
+        }
+        if name == 'preview':
+            settings['width'] = camera.getint('preview_width', fallback=settings['width'])
+            settings['height'] = camera.getint('preview_height', fallback=settings['height'])
+            settings['fps'] = camera.getfloat('preview_fps', fallback=settings['fps'])
+        return settings
+
+    def apply_camera_profile(self, name):
+        """Switch the open camera to a profile, pausing the stream while the driver reconfigures"""
+        if self.profile == name:
+            return
+        restart = self.stream is not None and self.stream.running
+        if restart:
+            self.stream.stop()
+        granted = configure_camera(
+            self.camera, **(self.preview_settings if name == 'preview' else self.capture_settings)
+        )
+        self.profile = name
+        self.camera_capabilities[name] = granted
+        if restart:
+            self.stream.start()
+        logger.info(f"Camera {name} profile: {granted}")
+
+    def _detection_scale_for(self, frame):
+        """Detection scale that gives the same detection resolution on either profile"""
+        return min(1.0, self.detection_scale * self.capture_settings['width'] / frame.shape[1])
+
+    def encode_capture_frame(self, frame, box):
+        """Encode a face, re-taking it on the high-resolution profile when dual streams are on"""
+        if self.dual_stream and self.profile != 'capture':
+            try:
+                self.apply_camera_profile('capture')
+                capture_frame, _ = self.read_frame(after=self.stream.sequence)
+                if capture_frame is not None:
+                    expected = scale_face_box(box, capture_frame.shape[1] / frame.shape[1], capture_frame.shape)
+                    boxes = self._detect(capture_frame, self._detection_scale_for(capture_frame))
+                    capture_box = max(boxes, key=lambda b: face_box_iou(b, expected), default=None)
+                    if capture_box is not None and face_box_iou(capture_box, expected) >= 0.3:
+                        face_encoding = self._encode(capture_frame, capture_box)
+                        if face_encoding is not None:
+                            return face_encoding, capture_frame
+                logger.info("Face not found on the capture profile, encoding the preview frame")
+            finally:
+                self.apply_camera_profile('preview')
+        
+        face_encoding = self._encode(frame, box)
+        if face_encoding is None:
+            raise ValueError("Could not encode detected face")
+        return face_encoding, frame
+
+    def _start_processing_service(self):
+        """Start the face worker pool, sized for the largest frame either profile can deliver"""
+        workers = self.config.getint('FACE_PROCESSING', 'workers', fallback=2)
+        if workers <= 0:
+            return None
+        profiles = [self.capture_settings, self.preview_settings] + list(self.camera_capabilities.values())
+        slot_bytes = max(profile['width'] * profile['height'] for profile in profiles) * 3
+        try:
+            return FaceProcessingService(
+                self.config, slot_bytes, workers,
+                self.config.getint('FACE_PROCESSING', 'queue_depth', fallback=4)
+            )
+        except Exception as e:
+            logger.warning(f"Face workers unavailable, processing in-process: {str(e)}")
+            return None
+
+    def _on_worker(self, frame, operation, args, fallback):
+        """Run a face operation on the worker pool, or in-process when the pool can't take it"""
+        if self.service and frame.nbytes <= self.service.slot_bytes:
+            try:
+                return self.service.submit(frame, operation, args).result()
+            except BrokenProcessPool as e:
+                logger.error(f"Face workers died, processing in-process: {str(e)}")
+                service, self.service = self.service, None
+                try:
+                    # Unlink the shared-memory slots and reap the executor
+                    service.close()
+                except Exception as close_error:
+                    logger.warning(f"Could not close face workers: {str(close_error)}")
+        return fallback()
+
+    def _detect(self, frame, scale):
+        return self._on_worker(
+            frame, 'detect', (self.detector.name, scale),
+            lambda: detect_faces(frame, scale, self.detector)
+        )
+
+    def _encode(self, frame, box):
+        return self._on_worker(frame, 'encode', [box], lambda: [encode_face(frame, box)])[0]
+
+    def _encode_all(self, frame, boxes):
+        return self._on_worker(
+            frame, 'encode_all', list(boxes),
+            lambda: face_recognition.face_encodings(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), boxes)
+        )
+
+    def _detector_sample_frames(self):
+        """Sample frames for the detector benchmark: configured images, else live frames"""
+        sample_dir = self.config.get('DETECTOR', 'sample_dir', fallback=None)
+        if sample_dir and Path(sample_dir).is_dir():
+            frames = [
+                cv2.imread(str(path)) for path in sorted(Path(sample_dir).iterdir())
+                if path.suffix.lower() in ('.jpg', '.jpeg', '.png')
+            ]
+            return [frame for frame in frames if frame is not None]
+        
+        frames = []
+        sequence = 0
+        for _ in range(self.config.getint('DETECTOR', 'benchmark_frames', fallback=5)):
+            frame, sequence = self.read_frame(after=sequence)
+            if frame is None:
+                break
+            frames.append(frame.copy())
+        return frames
+
+    def start_stream(self):
+        """Begin continuous background capture from the opened camera"""
+        self.stream = CameraStream(
+            self.camera,
+            ring_size=self.config.getint('CAMERA', 'ring_size', fallback=4)
+        )
+        self.stream.start()
+
+    def stop_stream(self):
+        if self.stream:
+            self.stream.stop()
+            logger.info(f"Camera stream stats: {self.stream.stats()}")
+            self.stream = None
+
+    def read_frame(self, after=0, timeout=1.0):
+        """Return the freshest frame (reusing frame_buffer) and its sequence number"""
+        stream = self.stream
+        if stream is None:
+            # Another thread is reopening the camera
+            return None, after
+        frame, _, sequence = stream.latest(out=self.frame_buffer, after=after, timeout=timeout)
+        if frame is not None:
+            self.frame_buffer = frame
+        return frame, sequence
+
+    def _read_current_frame(self):
+        """Read the freshest frame, reopening the camera once if needed"""
+        if not self.camera:
+            # Try to reinitialize camera once
+            if not self.recover_camera():
+                raise ValueError("Camera not available")
             
-            # Convert to RGB for face_recognition
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        stream = self.stream
+        frame, sequence = self.read_frame()
+        if frame is None:
+            # Try reopening the camera, unless the presence thread just did
+            if not self.recover_camera(stale_stream=stream):
+                raise ValueError("Camera not available")
+            frame, sequence = self.read_frame()
+            if frame is None:
+                raise ValueError("Could not capture frame after retry")
+        return frame, sequence
+
+    def capture_face(self):
+        """Capture and encode a face from the camera"""
+        try:
+            frame, sequence = self._read_current_frame()
             
-            # Find faces
-            face_locations = face_recognition.face_locations(rgb)
-            face_encodings = face_recognition.face_encodings(rgb, face_locations)
+            if self.capture_window > 0:
+                if self.dual_stream:
+                    # Score high-resolution frames so the frame we pick is the one we encode
+                    self.apply_camera_profile('capture')
+                    frame, sequence = self.read_frame(after=self.stream.sequence)
+                    if frame is None:
+                        raise ValueError("Could not capture frame on the capture profile")
+                return self.capture_best_face(frame, sequence)
             
-            if not face_encodings:
+            # Detect on a downscaled copy, encode only the largest face at full resolution
+            face_locations = self._detect(frame, self._detection_scale_for(frame))
+            if not face_locations:
                 raise ValueError("No face detected")
             
-            # Return the first face found
-            return face_encodings[0], frame
+            return self.encode_capture_frame(frame, max(face_locations, key=face_box_area))
             
         except Exception as e:
             logger.error(f"Face capture failed: {str(e)}")
             raise
         finally:
             # Don't release camera - keep it open for subsequent captures
-            pass
+            if self.dual_stream and self.camera:
+                self.apply_camera_profile('preview')
+
+    def capture_face_async(self):
+        """Start a face capture in the background; the Future yields (encoding, frame)"""
+        return self.capture_executor.submit(self.capture_face)
+
+    def capture_best_face(self, frame, sequence):
+        """Track faces over a short window and encode only the best-quality frame"""
+        deadline = time.monotonic() + self.capture_window
+        box = None
+        tracker = None
+        frontalness = 0.0
+        best_score = -1.0
+        best_box = None
+        frames_seen = 0
+        scale = self._detection_scale_for(frame)
+        target_size = self.quality_face_size * frame.shape[1] / self.capture_settings['width']
+        
+        while True:
+            # Without a tracker the last detection would go stale, so detect on every frame
+            if box is None or tracker is None or frames_seen % self.detect_every == 0:
+                boxes = self._detect(frame, scale)
+                if boxes:
+                    # Stay with the same visitor when several faces are in view
+                    previous = box
+                    box = max(boxes, key=lambda b: (face_box_iou(b, previous) if previous else 0.0, face_box_area(b)))
+                    frontalness = face_frontalness(frame, box)
+                    tracker = create_face_tracker()
+                    if tracker is not None:
+                        top, right, bottom, left = box
+                        tracker.init(frame, (left, top, right - left, bottom - top))
+                else:
+                    box = None
+                    tracker = None
+            elif tracker is not None:
+                ok, (x, y, w, h) = tracker.update(frame)
+                box = scale_face_box((y, x + w, y + h, x), 1.0, frame.shape) if ok else None
+            frames_seen += 1
+            
+            if box is not None:
+                score = face_quality(frame, box, frontalness, target_size)
+                if score > best_score:
+                    if self.best_frame_buffer is None or self.best_frame_buffer.shape != frame.shape:
+                        self.best_frame_buffer = frame.copy()
+                    else:
+                        np.copyto(self.best_frame_buffer, frame)
+                    best_score = score
+                    best_box = box
+                    if score >= self.quality_target:
+                        break
+            
+            if time.monotonic() >= deadline:
+                break
+            frame, sequence = self.read_frame(after=sequence)
+            if frame is None:
+                break
+        
+        if best_box is None:
+            raise ValueError("No face detected")
+        
+        logger.info(f"Selected face frame with quality {best_score:.2f} from {frames_seen} frames")
+        self._sample_for_detector(self.best_frame_buffer)
+        return self.encode_capture_frame(self.best_frame_buffer, best_box)
+
+    def _sample_for_detector(self, frame):
+        """Keep one face frame per capture for the deferred detector benchmark"""
+        samples = self.detector_samples
+        if samples is None:
+            return
+        samples.append(frame.copy())
+        if len(samples) < self.config.getint('DETECTOR', 'benchmark_frames', fallback=5):
+            return
+        self.detector_samples = None
+        threading.Thread(
+            target=self._select_detector_from_samples, args=(samples,), name='detector-benchmark', daemon=True
+        ).start()
+
+    def _select_detector_from_samples(self, frames):
+        try:
+            detector = select_face_detector(self.config, frames, self._detection_scale_for(frames[0]))
+            if detector is not None:
+                # Worker processes create detectors by name, so swapping the reference is enough
+                self.detector = detector
+        except Exception as e:
+            logger.warning(f"Deferred face detector benchmark failed: {str(e)}")
+
+    def capture_faces(self):
+        """Capture one high-resolution frame and encode every face in it with one batched call"""
+        try:
+            frame, sequence = self._read_current_frame()
+            if self.dual_stream:
+                self.apply_camera_profile('capture')
+                frame, sequence = self.read_frame(after=self.stream.sequence)
+                if frame is None:
+                    raise ValueError("Could not capture frame on the capture profile")
+            
+            face_locations = self._detect(frame, self._detection_scale_for(frame))
+            if not face_locations:
+                raise ValueError("No face detected")
+            # Largest (closest) face first, so callers can tell who is talking to the kiosk
+            face_locations = sorted(
+                face_locations, key=lambda box: (box[2] - box[0]) * (box[1] - box[3]), reverse=True
+            )
+            
+            face_encodings = self._encode_all(frame, face_locations)
+            logger.info(f"Encoded {len(face_encodings)} faces in one frame")
+            return face_encodings, face_locations, frame
+            
+        except Exception as e:
+            logger.error(f"Group face capture failed: {str(e)}")
+            raise
+        finally:
+            if self.dual_stream and self.camera:
+                self.apply_camera_profile('preview')
+
+    def recover_camera(self, stale_stream=None):
+        """Reopen the camera if its stream failed or is stale_stream; True once frames are flowing again"""
+        with self.camera_lock:
+            stream = self.stream
+            if self.camera and stream is not None and not stream.failed and stream is not stale_stream:
+                return True
+            try:
+                self.release_camera()
+                self.setup_camera()
+                return True
+            except Exception as e:
+                logger.warning(f"Camera recovery failed: {str(e)}")
+                return False
 
     def release_camera(self):
         """Release camera resources"""
+        self.stop_stream()
         if self.camera:
             self.camera.release()
             self.camera = None
 
+    def close(self):
+        """Release the camera and stop the capture thread and face workers"""
+        self.release_camera()
+        self.capture_executor.shutdown(wait=True, cancel_futures=True)
+        if self.service:
+            self.service.close()
+            self.service = None
+
+# ==================== PRESENCE DETECTION ====================
+
+class PresenceDetector:
+    """Low-rate motion and face presence detection that wakes the face pipeline"""
+    def __init__(self, face_rec, config):
+        self.face_rec = face_rec
+        self.fps = config.getfloat('PRESENCE', 'fps', fallback=5)
+        self.motion_threshold = config.getfloat('PRESENCE', 'motion_threshold', fallback=0.02)
+        self.approach_frames = config.getint('PRESENCE', 'approach_frames', fallback=3)
+        self.leave_seconds = config.getfloat('PRESENCE', 'leave_seconds', fallback=8)
+        self.reopen_seconds = config.getfloat('PRESENCE', 'reopen_seconds', fallback=5)
+        self.haar_width = config.getint('PRESENCE', 'haar_width', fallback=240)
+        self.haar = None
+        if config.getboolean('PRESENCE', 'haar_confirm', fallback=True):
+            try:
+                self.haar = HaarDetector(config.get('DETECTOR', 'haar_cascade', fallback=None))
+            except Exception as e:
+                logger.warning(f"Haar presence confirmation unavailable: {str(e)}")
+        
+        self.tiny_size = (80, 45)
+        self.background = None
+        self.frame_buffer = None
+        self.present = False
+        self.motion_frames = 0
+        self.last_seen = 0.0
+        self.approached = threading.Event()
+        self.left = threading.Event()
+        self.left.set()
+        self.callbacks = []
+        self.running = False
+        self.thread = None
+
+    def on_event(self, callback):
+        """Register callback(event) for 'person approached' / 'person left'"""
+        self.callbacks.append(callback)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="presence", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2)
+            self.thread = None
+        if self.face_rec.stream:
+            self.face_rec.stream.decode_interval = 0.0
+
+    def wait_for_approach(self, timeout=None):
+        return self.approached.wait(timeout)
+
+    def wait_for_departure(self, timeout=None):
+        return self.left.wait(timeout)
+
+    def _run(self):
+        interval = 1.0 / self.fps
+        sequence = 0
+        next_reopen = 0.0
+        while self.running:
+            started = time.monotonic()
+            stream = self.face_rec.stream
+            if (stream is None or stream.failed) and started >= next_reopen:
+                # Nothing else reopens the camera while the hallway is empty
+                next_reopen = started + self.reopen_seconds
+                if self.face_rec.recover_camera():
+                    stream = self.face_rec.stream
+                    sequence = 0
+            frame = None
+            if stream is not None and not stream.failed:
+                # Decode only the frames presence samples until someone arrives
+                stream.decode_interval = 0.0 if self.present else interval
+                frame, _, sequence = stream.latest(out=self.frame_buffer, after=sequence, timeout=interval)
+            if frame is not None:
+                self.frame_buffer = frame
+                try:
+                    self._update(frame, started)
+                except Exception as e:
+                    logger.warning(f"Presence detection failed: {str(e)}")
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    def _motion_fraction(self, frame):
+        """Fraction of pixels that differ from a running background on a tiny grayscale frame"""
+        tiny = cv2.cvtColor(cv2.resize(frame, self.tiny_size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        if self.background is None:
+            self.background = tiny.astype(np.float32)
+            return 0.0
+        
+        diff = cv2.absdiff(tiny, cv2.convertScaleAbs(self.background))
+        _, mask = cv2.threshold(diff, 25, 255, cv2.THRESH_BINARY)
+        # Adapt slowly while someone is present so they are not absorbed into the background
+        cv2.accumulateWeighted(tiny, self.background, 0.01 if self.present else 0.1)
+        return cv2.countNonZero(mask) / mask.size
+
+    def _face_visible(self, frame):
+        scale = min(1.0, self.haar_width / frame.shape[1])
+        return bool(detect_faces(frame, scale, self.haar))
+
+    def _update(self, frame, now):
+        moving = self._motion_fraction(frame) >= self.motion_threshold
+        # Haar only runs when something moved or to confirm a present visitor
+        face = self.haar is not None and (moving or self.present) and self._face_visible(frame)
+        
+        if not self.present:
+            self.motion_frames = self.motion_frames + 1 if moving else 0
+            if self.motion_frames >= self.approach_frames and (self.haar is None or face):
+                self.last_seen = now
+                self._set_present(True)
+        elif moving or face:
+            self.last_seen = now
+        elif now - self.last_seen >= self.leave_seconds:
+            self._set_present(False)
+
+    def _set_present(self, present):
+        self.present = present
+        self.motion_frames = 0
+        if self.face_rec.stream:
+            # The session needs every frame as soon as someone arrives
+            self.face_rec.stream.decode_interval = 0.0 if present else 1.0 / self.fps
+        event = 'person approached' if present else 'person left'
+        if present:
+            self.left.clear()
+            self.approached.set()
+        else:
+            self.approached.clear()
+            self.left.set()
+        logger.info(f"Presence: {event}")
+        for callback in self.callbacks:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.warning(f"Presence callback failed: {str(e)}")
+
 # ==================== ALPHA ROBOT MAIN CLASS ====================
 
 class AlphaRobot:
     """Main robot controller class"""
     def __init__(self, config_file='config.ini'):
         self.load_config(config_file)
-        self.db = DatabaseManager(self.config)
-        self.voice = VoiceEngine(self.config)
+        self.startup_started = time.monotonic()
+        self.startup_timeline = {}
         
-        try:
-            self.face_rec = FaceRecognition(self.config)
-        except Exception as e:
-            logger.error(f"Camera initialization failed: {str(e)}")
-            self.voice.speak(TRANSLATIONS[self.voice.current_language]['error_camera'])
-            self.face_rec = None
-            
+        # Database, audio and camera start independently; only db and voice are needed
+        # before the greeting, so the camera and detector benchmark keep going behind it
+        startup = ThreadPoolExecutor(max_workers=3, thread_name_prefix='startup')
+        self.ready = {
+            'db': self._start_component(startup, 'db', DatabaseManager),
+            'voice': self._start_component(startup, 'voice', VoiceEngine),
+            'face_rec': self._start_component(startup, 'face_rec', FaceRecognition)
+        }
+        startup.shutdown(wait=False)
+        self.ready['face_rec'].add_done_callback(self._face_rec_ready)
+        self.db = self.ready['db'].result()
+        self.voice = self.ready['voice'].result()
+        
+        self.presence = None
         self.current_user = None
+        self.group_mode = self.config.getboolean('RECOGNITION', 'group_mode', fallback=False)
+        self.capture_timeout = self.config.getfloat('FACE_PROCESSING', 'capture_timeout', fallback=15)
+        self.identification_wait = self.config.getfloat('SESSION', 'identification_wait', fallback=3)
+        self.identification_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='identification')
+        self.session_started = None
+        # Unknown faces from this session's group capture, registered before the session ends
+        self.pending_registrations = []
         self.services_offline = [
             "Life Skills Training",
             "Entrepreneurship Support",
@@ -934,12 +3742,42 @@ class AlphaRobot:
             "Computer Center Usage"
         ]
         
+        logger.info(
+            "Startup timeline: " + ", ".join(
+                f"{name} {started:.2f}-{finished:.2f}s"
+                for name, (started, finished) in sorted(self.startup_timeline.items(), key=lambda item: item[1])
+            ) + f"; ready for visitors at {time.monotonic() - self.startup_started:.2f}s"
+        )
         if self.db.online:
             logger.info("Running in online mode")
         else:
             logger.info("Running in offline mode")
             self.voice.speak(TRANSLATIONS[self.voice.current_language]['offline_mode'])
 
+    def _start_component(self, executor, name, factory):
+        """Build a component on the startup pool and record when it finished"""
+        def build():
+            started = time.monotonic() - self.startup_started
+            try:
+                return factory(self.config)
+            finally:
+                finished = time.monotonic() - self.startup_started
+                self.startup_timeline[name] = (started, finished)
+                logger.info(f"Startup: {name} finished at {finished:.2f}s (took {finished - started:.2f}s)")
+        return executor.submit(build)
+
+    def _face_rec_ready(self, future):
+        if future.exception() is not None:
+            logger.error(f"Camera initialization failed: {str(future.exception())}")
+
+    @property
+    def face_rec(self):
+        """Face pipeline, waiting for its background initialization on first use"""
+        try:
+            return self.ready['face_rec'].result()
+        except Exception:
+            return None
+
     def load_config(self, config_file):
         """Load and validate configuration"""
         self.config = configparser.ConfigParser()
@@ -954,17 +3792,52 @@ class AlphaRobot:
     def run(self):
         """Main execution flow"""
         try:
+            self.run_session()
+        except KeyboardInterrupt:
+            logger.info("Session interrupted by user")
+        finally:
+            self.cleanup()
+
+    def run_session(self):
+        """One visitor session from greeting to goodbye"""
+        # Faces queued by an earlier session never carry over to this one
+        self.pending_registrations = []
+        try:
+            # The visitor is already in front of the camera, so recognize them while we talk
+            identification = self.start_identification()
             self.greet_user()
             self.handle_language_selection()
-            self.handle_user_identification()
+            self.handle_user_identification(identification)
+            self.register_pending_faces()
             self.handle_service_selection()
             self.voice.speak(TRANSLATIONS[self.voice.current_language]['goodbye'])
         except KeyboardInterrupt:
-            logger.info("Session interrupted by user")
+            raise
         except Exception as e:
             logger.error(f"Runtime error: {str(e)}")
             self.voice.speak(TRANSLATIONS[self.voice.current_language]['error_general'])
+
+    def serve(self):
+        """Kiosk loop: stay idle until a visitor approaches, then run a session"""
+        if self.presence is None and self.face_rec:
+            self.presence = PresenceDetector(self.face_rec, self.config)
+        if not self.presence:
+            logger.warning("Presence detection needs the camera, running a single session")
+            self.run()
+            return
+        
+        try:
+            self.presence.start()
+            while True:
+                self.presence.wait_for_approach()
+                self.current_user = None
+                self.voice.set_language('en')
+                self.run_session()
+                self.presence.wait_for_departure()
+        except KeyboardInterrupt:
+            logger.info("Kiosk stopped by user")
         finally:
+            self.presence.stop()
             self.cleanup()
 
     def greet_user(self):
@@ -975,7 +3848,7 @@ class AlphaRobot:
         """Language selection process"""
         for attempt in range(max_attempts):
             self.voice.speak(TRANSLATIONS['en']['language_selection'])
-            response = self.voice.listen()
+            response = self.voice.listen(expect='languages')
             
             if not response:
                 if attempt < max_attempts - 1:
@@ -991,33 +3864,73 @@ class AlphaRobot:
 
     def _match_language(self, input_text):
         """Match spoken language to supported options"""
-        language_map = {
-            'english': 'en',
-            'siswati': 'ss',
-            'zulu': 'zu',
-            'tsonga': 'ts'
-        }
+        language_map = dict(zip(SPEECH_GRAMMARS['languages'], ['en', 'ss', 'zu', 'ts']))
         for lang_name, code in language_map.items():
             if lang_name in input_text:
                 return code
         return None
 
-    def handle_user_identification(self):
-        """User recognition or registration"""
+    def start_identification(self):
+        """Start face capture and recognition in the background; None without a camera"""
+        self.session_started = time.monotonic()
+        # Don't wait for a camera that is still starting; _identify will
+        if self.ready['face_rec'].done() and (not self.face_rec or not self.face_rec.camera):
+            return None
+        return self.identification_executor.submit(self._identify)
+
+    def _identify(self):
+        """Capture and recognize the visitors in view as a list of (encoding, user or None)"""
+        if not self.face_rec:
+            raise RuntimeError("Camera not available")
+        if self.group_mode:
+            face_encodings, _, _ = self.face_rec.capture_faces()
+            results = list(zip(face_encodings, self.db.recognize_users(face_encodings)))
+        else:
+            face_encoding, _ = self.face_rec.capture_face_async().result(timeout=self.capture_timeout)
+            results = [(face_encoding, self.db.recognize_user(face_encoding))]
+        if self.session_started is not None:
+            logger.info(f"Identification finished {time.monotonic() - self.session_started:.1f}s into the session")
+        return results
+
+    def _await_identification(self, identification):
+        """Collect the background result, recapturing once in the foreground if it failed"""
+        if identification is not None:
+            try:
+                try:
+                    return identification.result(timeout=self.identification_wait)
+                except TimeoutError:
+                    # Registering someone we already know is worse than a longer pause
+                    logger.warning(f"Identification not ready {self.identification_wait}s after it was needed, still waiting")
+                    return identification.result(timeout=max(0.0, self.capture_timeout - self.identification_wait))
+            except TimeoutError:
+                raise TimeoutError(f"Identification not ready {self.capture_timeout}s after it was needed")
+            except Exception as e:
+                # Usually no usable face during the greeting; the visitor is facing us now
+                logger.warning(f"Background identification failed, recapturing: {str(e)}")
+        return self.identification_executor.submit(self._identify).result(timeout=self.capture_timeout)
+
+    def handle_user_identification(self, identification=None):
+        """User recognition or registration, using the session's background result when given"""
         try:
             if not self.face_rec or not self.face_rec.camera:
                 logger.warning("Skipping face recognition - camera not available")
+                if self.ready['face_rec'].exception() is not None:
+                    self.voice.speak(TRANSLATIONS[self.voice.current_language]['error_camera'])
                 self._register_new_user_without_face()
                 return
+            
+            results = self._await_identification(identification)
+            if self.group_mode:
+                self.handle_group_identification(results)
+                return
                 
             # Try face recognition first
-            face_encoding, _ = self.face_rec.capture_face()
-            user = self.db.recognize_user(face_encoding)
+            face_encoding, user = results[0]
             
             if user:
                 self.current_user = user
                 self.db.log_visit(user['user_id'], recognized=True)
-                logger.info(f"Recognized user: {user['first_name']}")
+                logger.info(f"Recognized user: {user['first_name']} (distance {user['distance']:.3f})")
                 return
                 
             # New user registration
@@ -1028,6 +3941,31 @@ class AlphaRobot:
             self.voice.speak(TRANSLATIONS[self.voice.current_language]['error_face'])
             self._register_new_user_without_face()
 
+    def handle_group_identification(self, results):
+        """Log everyone recognized in front of the camera and queue unknown faces for registration"""
+        recognized = [user for _, user in results if user]
+        self.db.log_visits([(user['user_id'], True) for user in recognized])
+        unknown = [i for i, (_, user) in enumerate(results) if user is None]
+        self.pending_registrations = [results[i][0] for i in unknown]
+        logger.info(
+            f"Group identification: recognized {[user['first_name'] for user in recognized]}, "
+            f"unknown faces {unknown} queued for registration"
+        )
+        
+        if recognized:
+            self.current_user = recognized[0]
+        elif self.pending_registrations:
+            # capture_faces lists the largest face first: the visitor answering the questions
+            self._register_new_user(self.pending_registrations.pop(0))
+
+    def register_pending_faces(self):
+        """Register the group's remaining unknown faces, one visitor after another"""
+        primary = self.current_user
+        while self.pending_registrations:
+            self._register_new_user(self.pending_registrations.pop(0))
+        # Services are still offered to the visitor who started the session
+        self.current_user = primary
+
     def _register_new_user(self, face_encoding=None):
         """Complete new user registration with face capture"""
         user_data = {'language_preference': self.voice.current_language}
@@ -1040,7 +3978,7 @@ class AlphaRobot:
         ]:
             while True:
                 self.voice.speak(TRANSLATIONS[self.voice.current_language][question_key])
-                response = self.voice.listen()
+                response = self._listen_for(field)
                 
                 if response and self._validate_input(response, field):
                     user_data[field] = response.title() if field in ['first_name', 'last_name'] else response
@@ -1054,20 +3992,13 @@ class AlphaRobot:
             ('email', 'email_question')
         ]:
             self.voice.speak(TRANSLATIONS[self.voice.current_language][question_key])
-            response = self.voice.listen()
+            response = self._listen_for(field)
             
             if response and self._validate_input(response, field):
                 user_data[field] = response
 
         # Complete registration
-        try:
-            user_id = self.db.register_user(user_data, face_encoding)
-            self.current_user = {'user_id': user_id, **user_data}
-            self.db.log_visit(user_id, recognized=False)
-            self.voice.speak(TRANSLATIONS[self.voice.current_language]['registration_success'])
-        except Exception as e:
-            logger.error(f"Registration failed: {str(e)}")
-            raise
+        self._complete_registration(user_data, face_encoding)
 
     def _register_new_user_without_face(self):
         """Register new user when camera is unavailable"""
@@ -1081,7 +4012,7 @@ class AlphaRobot:
         ]:
             while True:
                 self.voice.speak(TRANSLATIONS[self.voice.current_language][question_key])
-                response = self.voice.listen()
+                response = self._listen_for(field)
                 
                 if response and self._validate_input(response, field):
                     user_data[field] = response.title() if field in ['first_name', 'last_name'] else response
@@ -1095,20 +4026,42 @@ class AlphaRobot:
             ('email', 'email_question')
         ]:
             self.voice.speak(TRANSLATIONS[self.voice.current_language][question_key])
-            response = self.voice.listen()
+            response = self._listen_for(field)
             
             if response and self._validate_input(response, field):
                 user_data[field] = response
 
         # Complete registration without face
-        try:
-            user_id = self.db.register_user(user_data, None)
-            self.current_user = {'user_id': user_id, **user_data}
-            self.db.log_visit(user_id, recognized=False)
-            self.voice.speak(TRANSLATIONS[self.voice.current_language]['registration_success'])
-        except Exception as e:
-            logger.error(f"Registration failed: {str(e)}")
-            raise
+        self._complete_registration(user_data, None)
+
+    def _complete_registration(self, user_data, face_encoding):
+        """Store a new user, or greet them as known if their ID number is already registered"""
+        # Usually a returning visitor whose face wasn't recognized in time
+        existing = self.db.find_user_by_id_number(user_data['id_number'])
+        if not existing:
+            try:
+                user_id = self.db.register_user(user_data, face_encoding)
+                self.current_user = {'user_id': user_id, **user_data}
+                self.db.log_visit(user_id, recognized=False)
+                self.voice.speak(TRANSLATIONS[self.voice.current_language]['registration_success'])
+                return
+            except Exception as e:
+                # Another kiosk may have registered the same ID number in the meantime
+                existing = self.db.find_user_by_id_number(user_data['id_number'])
+                if not existing:
+                    logger.error(f"Registration failed: {str(e)}")
+                    raise
+        
+        logger.info(f"ID number already registered, treating as returning user {existing['user_id']}")
+        self.current_user = existing
+        self.db.log_visit(existing['user_id'], recognized=True)
+
+    def _listen_for(self, field):
+        """Listen for a registration answer, decoding numbers against the digit grammar"""
+        if field in ('id_number', 'phone'):
+            response = self.voice.listen(expect='digits')
+            return digits_from_words(response) if response else response
+        return self.voice.listen()
 
     def _validate_input(self, input_text, input_type):
         """Basic input validation"""
@@ -1122,12 +4075,12 @@ class AlphaRobot:
             return re.match(r"[^@]+@[^@]+\.[^@]+", input_text)
         return True
 
-    def handle_service_selection(self):
+    def handle_service_selection(self, max_attempts=5):
         """Service selection and information flow"""
         self.voice.speak(TRANSLATIONS[self.voice.current_language]['services_intro'])
         
-        while True:
-            response = self.voice.listen()
+        for attempt in range(max_attempts):
+            response = self.voice.listen(expect=list(self._available_services()))
             if not response:
                 self.voice.speak(TRANSLATIONS[self.voice.current_language]['error_audio'])
                 continue
@@ -1138,7 +4091,7 @@ class AlphaRobot:
                 
                 # Offer human assistance
                 self.voice.speak(TRANSLATIONS[self.voice.current_language]['human_assistance'])
-                human_response = self.voice.listen()
+                human_response = self.voice.listen(expect='yes_no')
                 if human_response and 'yes' in human_response.lower():
                     self._handle_human_assistance(service)
                 else:
@@ -1148,27 +4101,32 @@ class AlphaRobot:
                 return
                 
             self.voice.speak("I didn't understand. Please say the name of the service you want.")
+        
+        logger.warning("No service selected after failed attempts")
 
     def _match_service(self, input_text):
         """Match user input to available services"""
-        cursor = self.db.connection.cursor()
-        
-        if not self.db.online:
-            cursor.execute("""
-                SELECT service_id, service_name FROM services 
-                WHERE offline_available = TRUE
-            """)
-        else:
-            cursor.execute("SELECT service_id, service_name FROM services")
-        
-        available_services = {row[1].lower(): row[0] for row in cursor.fetchall()}
-        
-        for service_name, service_id in available_services.items():
+        for service_name, service_id in self._available_services().items():
             if service_name in input_text.lower():
                 return {'id': service_id, 'name': service_name}
                 
         return None
 
+    def _available_services(self):
+        """Lower-cased service name -> service_id for the current mode"""
+        with self.db.lock:
+            cursor = self.db.connection.cursor()
+            
+            if not self.db.online:
+                cursor.execute("""
+                    SELECT service_id, service_name FROM services 
+                    WHERE offline_available = TRUE
+                """)
+            else:
+                cursor.execute("SELECT service_id, service_name FROM services")
+            
+            return {row[1].lower(): row[0] for row in cursor.fetchall()}
+
     def _provide_service_details(self, service):
         """Provide detailed information about a service"""
         service_key = service['name'].lower().replace(" ", "_")
@@ -1213,18 +4171,203 @@ class AlphaRobot:
     def cleanup(self):
         """Clean up resources"""
         try:
+            if hasattr(self, 'db'):
+                logger.info(f"Recent visitor cache: {self.db.visitor_cache.stats()}")
+            if hasattr(self, 'voice'):
+                logger.info(f"TTS cache: {self.voice.tts_cache.stats()}")
+                logger.info(f"Speech output: {self.voice.speech_stats()}")
+                logger.info(f"Speech input: {self.voice.listen_stats()}")
+            # Let an in-flight identification finish before its camera, workers and DB go away
+            if hasattr(self, 'identification_executor'):
+                self.identification_executor.shutdown(wait=True, cancel_futures=True)
+            if hasattr(self, 'ready') and self.face_rec:
+                self.face_rec.close()
+            if hasattr(self, 'voice'):
+                self.voice.close()
             if hasattr(self, 'db') and self.db.connection:
                 self.db.connection.close()
-            if hasattr(self, 'face_rec') and self.face_rec:
-                self.face_rec.release_camera()
+            if hasattr(self, 'db') and self.db.listen_connection:
+                self.db.listen_connection.close()
             cv2.destroyAllWindows()
             logger.info("Resources cleaned up")
         except Exception as e:
             logger.error(f"Cleanup failed: {str(e)}")
 
+MODULE_IMPORT_SECONDS = time.perf_counter() - _module_import_started
+
 # ==================== MAIN ENTRY POINT ====================
 
+def run_detection_benchmark(config_file, image_dir=None, frame_count=20):
+    """Report detection latency and accuracy for each detection scale"""
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    
+    if image_dir:
+        frames = [
+            cv2.imread(str(path)) for path in sorted(Path(image_dir).iterdir())
+            if path.suffix.lower() in ('.jpg', '.jpeg', '.png')
+        ]
+        frames = [frame for frame in frames if frame is not None]
+    else:
+        face_rec = FaceRecognition(config)
+        frames = []
+        sequence = 0
+        try:
+            while len(frames) < frame_count:
+                frame, sequence = face_rec.read_frame(after=sequence)
+                if frame is None:
+                    break
+                frames.append(frame.copy())
+                time.sleep(0.1)
+        finally:
+            face_rec.close()
+    
+    if not frames:
+        raise RuntimeError("No frames available for the detection benchmark")
+    
+    logger.info(f"Benchmarking face detection on {len(frames)} frames")
+    for result in benchmark_detection_scales(frames):
+        logger.info(
+            f"scale {result['scale']:.2f}: {result['latency_ms']:.1f} ms/frame, "
+            f"recall {result['recall']:.0%} vs full resolution, "
+            f"encoding drift {result['encoding_drift']:.3f}"
+        )
+
+def prerender_audio(config_file, bundle_dir=None):
+    """Synthesize every translation prompt into the audio bundle, rendering only new text"""
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    bundle_dir = Path(bundle_dir or config.get('PATHS', 'audio_bundle', fallback='alpha_data/audio_bundle'))
+    workers = config.getint('VOICE', 'prerender_workers', fallback=4)
+    retries = config.getint('VOICE', 'prerender_retries', fallback=3)
+    stream_speech = config.getboolean('VOICE', 'stream_speech', fallback=True)
+    chunk_chars = config.getint('VOICE', 'stream_chunk_chars', fallback=200)
+    bundle_dir.mkdir(parents=True, exist_ok=True)
+    previous = load_audio_bundle_index(bundle_dir) or {}
+    
+    entries = {}
+    pending = {}
+    for language, name, text in iter_translation_prompts():
+        lang_code = TRANSLATIONS[language]['lang_code']
+        # Render the same sentence chunks that streaming speech will request
+        chunks = split_speech(text, chunk_chars) if stream_speech else [text]
+        for i, chunk in enumerate(chunks):
+            key = tts_cache_key(chunk, lang_code)
+            entry_name = f"{language}.{name}" if len(chunks) == 1 else f"{language}.{name}#{i}"
+            entries[entry_name] = {'key': key, 'lang_code': lang_code, 'text': chunk}
+            # Languages that fall back to English TTS share audio for identical text
+            if not (bundle_dir / f"{key}.mp3").exists():
+                pending[key] = (chunk, lang_code)
+    
+    def render(key, text, lang_code):
+        for attempt in range(retries):
+            try:
+                write_file_atomic(bundle_dir / f"{key}.mp3", render_speech(text, lang_code))
+                return
+            except Exception as e:
+                if attempt == retries - 1:
+                    raise
+                logger.warning(f"Rendering {text[:40]!r} failed, retrying: {str(e)}")
+                time.sleep(2 ** attempt)
+    
+    logger.info(f"Rendering {len(pending)} of {len(entries)} prompts with {workers} workers")
+    failed = set()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(render, key, *args): key for key, args in pending.items()}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                failed.add(futures[future])
+                logger.error(f"Could not render prompt audio: {str(e)}")
+    
+    entries = {name: entry for name, entry in entries.items() if entry['key'] not in failed}
+    keys = {entry['key'] for entry in entries.values()}
+    for path in bundle_dir.glob('*.mp3'):
+        if path.stem not in keys:
+            path.unlink()
+    
+    changed = (
+        {name: entry['key'] for name, entry in entries.items()}
+        != {name: entry['key'] for name, entry in previous.get('entries', {}).items()}
+    )
+    index = {
+        'format': AUDIO_BUNDLE_FORMAT,
+        'version': previous.get('version', 0) + (1 if changed else 0),
+        'engine': 'gtts',
+        'created': datetime.now().isoformat() if changed else previous.get('created'),
+        'entries': entries
+    }
+    write_file_atomic(bundle_dir / 'index.json', json.dumps(index, indent=2, ensure_ascii=False).encode('utf-8'))
+    logger.info(f"Audio bundle version {index['version']}: {len(entries)} prompts in {bundle_dir}")
+    if failed:
+        raise RuntimeError(f"{len(failed)} prompts could not be rendered; rerun to retry them")
+
+def run_asr_fixtures(config_file, fixture_dir):
+    """Decode recorded WAV fixtures with the local recognizer and report accuracy and latency"""
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    recognizer = load_local_recognizer(
+        config.get('VOICE', 'vosk_model', fallback='alpha_data/models/vosk-model-small-en-us')
+    )
+    if recognizer is None:
+        raise RuntimeError("Local speech recognition is not available")
+    
+    # fixtures.json: [{"file": "zulu.wav", "grammar": "languages", "text": "zulu"}, ...]
+    fixture_dir = Path(fixture_dir)
+    with open(fixture_dir / 'fixtures.json', encoding='utf-8') as f:
+        fixtures = json.load(f)
+    
+    correct = 0
+    latencies = []
+    for fixture in fixtures:
+        with wave.open(str(fixture_dir / fixture['file']), 'rb') as wav:
+            if wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+                logger.warning(f"Skipping {fixture['file']}: fixtures must be 16-bit mono")
+                continue
+            pcm = wav.readframes(wav.getnframes())
+            sample_rate = wav.getframerate()
+        
+        started = time.monotonic()
+        text, confidence = recognizer.recognize(pcm, resolve_grammar(fixture.get('grammar')), sample_rate)
+        latencies.append(time.monotonic() - started)
+        expected = fixture['text'].lower()
+        if fixture.get('grammar') == 'digits' and text:
+            text = digits_from_words(text)
+        correct += text == expected
+        logger.info(
+            f"{fixture['file']}: {'ok' if text == expected else 'MISS'} "
+            f"got {text!r} expected {expected!r} (confidence {confidence:.2f}, {1000 * latencies[-1]:.0f} ms)"
+        )
+    
+    if not latencies:
+        raise RuntimeError(f"No usable fixtures in {fixture_dir}")
+    logger.info(
+        f"Local recognition: {correct}/{len(latencies)} correct, "
+        f"mean {1000 * np.mean(latencies):.0f} ms, max {1000 * max(latencies):.0f} ms"
+    )
+    return correct / len(latencies)
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Alpha reception robot")
+    parser.add_argument(
+        '--benchmark-detection', nargs='?', const='', metavar='IMAGE_DIR',
+        help="benchmark face detection scales on images in IMAGE_DIR, or on live camera frames"
+    )
+    parser.add_argument(
+        '--prerender-audio', nargs='?', const='', metavar='BUNDLE_DIR',
+        help="synthesize every prompt into the audio bundle (default: [PATHS] audio_bundle)"
+    )
+    parser.add_argument(
+        '--asr-fixtures', metavar='FIXTURE_DIR',
+        help="check local speech recognition against the WAV files listed in FIXTURE_DIR/fixtures.json"
+    )
+    parser.add_argument(
+        '--kiosk', action='store_true',
+        help="run continuously, starting a session whenever a visitor approaches"
+    )
+    args = parser.parse_args()
+    
     try:
         # Create default config if it doesn't exist
         config_path = Path('config.ini')
@@ -1234,16 +4377,91 @@ if __name__ == "__main__":
                 'host': 'localhost',
                 'database': 'alpha_robot',
                 'user': 'postgres',
-                'password': 'jumpstart'
+                'password': 'jumpstart',
+                'listen_retry_seconds': '60'
             }
             default_config['PATHS'] = {
                 'offline_db': 'alpha_data/offline.db',
+                'tts_cache': 'alpha_data/tts_cache',
+                'audio_bundle': 'alpha_data/audio_bundle',
                 'log_file': 'alpha_data/alpha.log'
             }
             default_config['CAMERA'] = {
                 'device_id': '0',
                 'width': '1280',
-                'height': '720'
+                'height': '720',
+                'fps': '30',
+                'fourcc': 'MJPG',
+                'buffer_size': '1',
+                'preview_width': '640',
+                'preview_height': '360',
+                'preview_fps': '15',
+                'ring_size': '4',
+                'detection_scale': '0.25',
+                'capture_window': '1.5',
+                'detect_every': '3',
+                'quality_target': '0.8',
+                'quality_face_size': '160'
+            }
+            default_config['DETECTOR'] = {
+                'backend': 'auto',
+                'candidates': 'hog,haar,dnn,cnn',
+                'reference': 'hog',
+                'min_recall': '0.9',
+                'benchmark_frames': '5',
+                'dnn_prototxt': 'alpha_data/models/deploy.prototxt',
+                'dnn_model': 'alpha_data/models/res10_300x300_ssd_iter_140000.caffemodel'
+            }
+            default_config['PRESENCE'] = {
+                'fps': '5',
+                'motion_threshold': '0.02',
+                'approach_frames': '3',
+                'leave_seconds': '8',
+                'reopen_seconds': '5',
+                'haar_confirm': 'true',
+                'haar_width': '240'
+            }
+            default_config['RECOGNITION'] = {
+                'tolerance': '0.6',
+                'index_min_size': '2000',
+                'index_nprobe': '8',
+                'cache_size': '32',
+                'cache_ttl': '14400',
+                'cache_tolerance': '0.5',
+                'shortlist_size': '5',
+                'learn_templates': 'true',
+                'max_templates': '5',
+                'learn_min_distance': '0.2',
+                'learn_max_distance': '0.45',
+                'group_mode': 'false'
+            }
+            default_config['VOICE'] = {
+                'tts_cache_mb': '200',
+                'stream_speech': 'true',
+                'stream_chunk_chars': '200',
+                'stream_queue_size': '2',
+                'prerender_workers': '4',
+                'prerender_retries': '3',
+                'local_asr': 'true',
+                'vosk_model': 'alpha_data/models/vosk-model-small-en-us',
+                'local_min_confidence': '0.6',
+                'vad': 'true',
+                'vad_aggressiveness': '2',
+                'vad_onset_ms': '90',
+                'vad_endpoint_ms': '500',
+                'vad_preroll_ms': '300',
+                'mic_ring_seconds': '10',
+                'barge_in': 'true',
+                'barge_in_ms': '240',
+                'barge_in_min_rms': '1000'
+            }
+            default_config['SESSION'] = {
+                'identification_wait': '3'
+            }
+            default_config['FACE_PROCESSING'] = {
+                'workers': '2',
+                'queue_depth': '4',
+                'capture_timeout': '15'
             }
             
             config_path.parent.mkdir(exist_ok=True)
@@ -1251,9 +4469,24 @@ if __name__ == "__main__":
                 default_config.write(configfile)
             logger.info("Created default configuration file")
         
-        # Initialize and run the robot
-        robot = AlphaRobot(config_path)
-        robot.run()
+        if args.asr_fixtures:
+            run_asr_fixtures(config_path, args.asr_fixtures)
+        elif args.prerender_audio is not None:
+            prerender_audio(config_path, args.prerender_audio or None)
+        elif args.benchmark_detection is not None:
+            preload_modules([cv2, face_recognition])
+            run_detection_benchmark(config_path, args.benchmark_detection or None)
+            log_import_report()
+        else:
+            # The face models load slowest but are needed last, so warm them first
+            preload_modules([face_recognition, cv2, sr, gtts])
+            # Initialize and run the robot
+            robot = AlphaRobot(config_path)
+            log_import_report()
+            if args.kiosk:
+                robot.serve()
+            else:
+                robot.run()
     except Exception as e:
         logger.critical(f"Application failed to start: {str(e)}")
         sys.exit(1)
\ No newline at end of file